@@ -1,5 +1,7 @@
 from django.contrib import admin
+from core.admin import LargeTableModelAdmin
 from .models import Account, Package, PaymentHistory
+from .services.utils import approve_payments
 
 
 @admin.register(Account)
@@ -16,7 +18,7 @@ class PackageAdmin(admin.ModelAdmin):
 
 
 @admin.register(PaymentHistory)
-class PaymentHistoryAdmin(admin.ModelAdmin):
+class PaymentHistoryAdmin(LargeTableModelAdmin):
     list_display = [
         "user",
         "package_name",
@@ -26,7 +28,9 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
         "expiration_date",
         "created_at",
     ]
-    list_filter = ["status"]
+    list_select_related = ["user"]
+    actions = ["approve_selected_payments"]
+    list_filter = ["status", "created_at"]
     search_fields = ["user__email", "user__account__phone"]
     readonly_fields = [
         "user_organization_name",
@@ -38,6 +42,7 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
         "package_zatca_related",
         "amount",
         "created_at",
+        "completed_at",
         "expiration_date",
         "is_expiry_field",
     ]
@@ -75,6 +80,7 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
                     "discount",
                     "note",
                     "created_at",
+                    "completed_at",
                     "expiration_date",
                     "is_expiry_field",
                 )
@@ -82,6 +88,11 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
         ),
     )
 
+    @admin.action(description="Approve selected pending payments")
+    def approve_selected_payments(self, request, queryset):
+        approved = approve_payments(queryset)
+        self.message_user(request, f"{approved} payments approved")
+
     def get_readonly_fields(self, request, obj=None):
         read_only_fields = super().get_readonly_fields(request, obj)
         # If the invoice is already created, make all fields read-only
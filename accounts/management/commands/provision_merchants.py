@@ -0,0 +1,63 @@
+import csv
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounts.services.constants import PROVISION_BATCH_SIZE
+from accounts.services.provisioning import MerchantProvisioner
+
+
+class Command(BaseCommand):
+    help = "Create merchants (user + account) in bulk from a reseller CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", help="Path to the merchants CSV file")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PROVISION_BATCH_SIZE,
+            help="Number of rows inserted per batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes used to hash passwords (default: CPU count)",
+        )
+        parser.add_argument(
+            "--no-emails",
+            action="store_true",
+            help="Do not queue the verification emails",
+        )
+        parser.add_argument(
+            "--report",
+            help="Write the per-row error report to this CSV file",
+        )
+
+    def handle(self, *args, **options):
+        provisioner = MerchantProvisioner(
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            send_emails=not options["no_emails"],
+        )
+
+        try:
+            with open(options["csv_file"], newline="", encoding="utf-8-sig") as file:
+                report = provisioner.run(file)
+        except (OSError, ValidationError) as e:
+            raise CommandError(e)
+
+        if options["report"]:
+            with open(options["report"], "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(["row", "email", "field", "error"])
+                for error in report["errors"]:
+                    for field, messages in error["errors"].items():
+                        for message in messages:
+                            writer.writerow(
+                                [error["row"], error["email"], field, message]
+                            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']} merchants, {report['failed']} rows failed"
+            )
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_alter_paymenthistory_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='logo_header',
+            field=models.ImageField(blank=True, editable=False, help_text='Compressed logo for the invoice header', null=True, upload_to='logos/variants/'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='logo_inline',
+            field=models.ImageField(blank=True, editable=False, help_text='Small logo embedded in receipts', null=True, upload_to='logos/variants/'),
+        ),
+    ]
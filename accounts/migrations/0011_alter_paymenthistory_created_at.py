@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_account_logo_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    # the completion time of the existing payments is unknown, use their creation
+    PaymentHistory = apps.get_model("accounts", "PaymentHistory")
+    PaymentHistory.objects.filter(status="completed").update(
+        completed_at=models.F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_paymenthistory_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='expiration_date',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -6,6 +6,7 @@ from decimal import Decimal
 import uuid
 from .services.utils import check_subscription_status
 from .services.validators import NumericLengthValidator, VatValidator
+from .services.images import delete_logo_variants, generate_logo_variant
 from django.core.validators import MaxValueValidator
 from .services.constants import PAYMENT_STATUS
 from django.conf import settings
@@ -54,6 +55,22 @@ class Account(models.Model):
     # not required info
     logo = models.ImageField(upload_to="logos/", null=True, blank=True)
 
+    # logo variants generated from the logo when it's uploaded
+    logo_header = models.ImageField(
+        upload_to="logos/variants/",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Compressed logo for the invoice header",
+    )
+    logo_inline = models.ImageField(
+        upload_to="logos/variants/",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Small logo embedded in receipts",
+    )
+
     def clean(self):
         # Check if the logo file size exceeds the maximum allowed size (in bytes)
         max_logo_size = 1024 * 1024  # 1 MB
@@ -69,8 +86,23 @@ class Account(models.Model):
         else:
             self.vat = Decimal("15.0")
 
+        # Generate the logo variants once when a new logo is uploaded,
+        # the files of the replaced variants are deleted after the commit
+        old_variants = [variant for variant in (self.logo_header, self.logo_inline) if variant]
+        if self.logo and not self.logo._committed:
+            self.logo_header = generate_logo_variant(self.logo, "header")
+            self.logo_inline = generate_logo_variant(self.logo, "inline")
+        elif not self.logo:
+            self.logo_header = None
+            self.logo_inline = None
+        else:
+            old_variants = []
+
         super().save(*args, **kwargs)
 
+        if old_variants:
+            transaction.on_commit(lambda: delete_logo_variants(old_variants))
+
     class Meta:
         ordering = ["-id"]
 
@@ -116,8 +148,11 @@ class PaymentHistory(models.Model):
         max_length=20, choices=PAYMENT_STATUS, default="pending", db_index=True
     )
 
-    expiration_date = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(default=timezone.now)
+    expiration_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    completed_at = models.DateTimeField(
+        null=True, blank=True, editable=False, db_index=True
+    )
 
     # persistent package info
     package_name = models.CharField(max_length=100, null=True, blank=True)
@@ -159,6 +194,9 @@ class PaymentHistory(models.Model):
     #     super().clean()
 
     def save(self, *args, **kwargs):
+        if self.status == "completed" and self.completed_at is None:
+            self.completed_at = timezone.now()
+
         if self.status == "completed" and self.expiration_date is None:
             duration_days = self.duration * 30
 
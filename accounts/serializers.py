@@ -107,3 +107,12 @@ class PackageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Package
         fields = "__all__"
+
+
+class MerchantProvisionSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text="Merchants CSV file")
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(".csv"):
+            raise serializers.ValidationError("Only CSV files are supported.")
+        return value
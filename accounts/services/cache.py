@@ -0,0 +1,69 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from core.cache import bump_version, cached, get_or_set
+
+ACCOUNT_PROFILE_CACHE_TIMEOUT = settings.ACCOUNT_PROFILE_CACHE_TIMEOUT
+PACKAGES_CACHE_TIMEOUT = settings.PACKAGES_CACHE_TIMEOUT
+
+
+def account_profile_key(user_id):
+    return f"account_profile:{user_id}"
+
+
+def get_account_profile(user_id, serialize):
+    """
+    Return the cached profile snapshot ({"data", "etag"}) of the user's account.
+    serialize is called to build the payload on a cache miss.
+    """
+
+    def build():
+        data = serialize()
+        payload = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+        return {
+            "data": data,
+            "etag": hashlib.sha1(payload.encode("utf-8")).hexdigest(),
+        }
+
+    # no L1 copy, the profile must change everywhere once invalidated
+    return get_or_set(
+        account_profile_key(user_id),
+        build,
+        ACCOUNT_PROFILE_CACHE_TIMEOUT,
+        name="account_profile",
+        local_timeout=0,
+    )
+
+
+def invalidate_account_profile(user_id):
+    """
+    Drop the cached profile snapshot, call it when any data of the profile changes
+    (account, user, payments or the signing credential)
+    """
+    cache.delete(account_profile_key(user_id))
+
+
+def invalidate_account_profiles(user_ids):
+    """
+    invalidate_account_profile for many users, used after the bulk updates
+    """
+    cache.delete_many([account_profile_key(user_id) for user_id in user_ids])
+
+
+@cached(lambda: "packages", PACKAGES_CACHE_TIMEOUT, version_key="packages")
+def package_list():
+    """
+    Serialized list of the packages
+    """
+    from accounts.serializers import PackageSerializer
+
+    return PackageSerializer(PackageSerializer.Meta.model.objects.all(), many=True).data
+
+
+def invalidate_packages():
+    """
+    Drop the cached package list, the packages are only changed from the admin
+    """
+    bump_version("packages")
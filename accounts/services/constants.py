@@ -12,3 +12,23 @@ PAYMENT_STATUS = (
     ("completed", "completed"),
     ("not_active", "Not Active"),
 )
+
+# Bulk merchant provisioning
+PROVISION_CSV_FIELDS = ACCOUNT_REQUIRED_FIELDS + [
+    "email",
+    "password",
+    "taxable",
+]
+PROVISION_BATCH_SIZE = 500
+PROVISION_EMAIL_BATCH_SIZE = 100
+# seconds an uploaded CSV file may stay in the private storage (a killed worker)
+PROVISION_UPLOAD_MAX_AGE = 24 * 60 * 60
+
+# Logo variants generated on upload (max width, max height) in pixels
+LOGO_VARIANTS = {
+    "header": (400, 160),  # invoice document header
+    "inline": (160, 64),  # embedded in receipts
+}
+LOGO_JPEG_QUALITY = 80
+# Seconds the logo data URIs are cached
+LOGO_DATA_URI_TIMEOUT = 24 * 60 * 60
@@ -0,0 +1,84 @@
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.conf import settings
+from accounts.models import PaymentHistory
+
+FREE_PERIOD = settings.FREE_PERIOD
+
+
+class Entitlement:
+    """
+    Subscription entitlement of a user.
+    The payments are loaded lazily with a single query and shared by every
+    permission class that reads the entitlement during the request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def email_verified(self):
+        return self.user.email_verified
+
+    @property
+    def profile_completed(self):
+        return self.user.profile_completed
+
+    @cached_property
+    def free_days_ago(self):
+        return self.user.date_joined + timezone.timedelta(days=FREE_PERIOD)
+
+    @property
+    def free_tier_active(self):
+        return timezone.now() <= self.free_days_ago
+
+    @cached_property
+    def _payments(self):
+        """
+        Load the last payment and the last completed payment in one query
+        """
+        payments = PaymentHistory.objects.filter(user=self.user).order_by(
+            "-created_at"
+        )
+        last_payment = payments.values("pk")[:1]
+        last_completed_payment = payments.filter(status="completed").values("pk")[:1]
+
+        return sorted(
+            PaymentHistory.objects.filter(
+                Q(pk__in=last_payment) | Q(pk__in=last_completed_payment)
+            ),
+            key=lambda payment: payment.created_at,
+            reverse=True,
+        )
+
+    @property
+    def last_payment(self):
+        return self._payments[0] if self._payments else None
+
+    @property
+    def last_completed_payment(self):
+        return next(
+            (payment for payment in self._payments if payment.status == "completed"),
+            None,
+        )
+
+    @property
+    def last_completed_payment_active(self):
+        """
+        Check if the last completed payment is not expired, None if there is no completed payment
+        """
+        payment = self.last_completed_payment
+        return (not payment.is_expiry) if payment else None
+
+
+def get_entitlement(request):
+    """
+    Return the entitlement of the request user, computed once per request
+    """
+    entitlement = getattr(request, "_entitlement", None)
+    if entitlement is None or entitlement.user is not request.user:
+        entitlement = Entitlement(request.user)
+        request._entitlement = entitlement
+
+    return entitlement
@@ -0,0 +1,81 @@
+from base64 import b64encode
+from io import BytesIO
+import os
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from core.cache import get_or_set
+from .constants import LOGO_DATA_URI_TIMEOUT, LOGO_VARIANTS, LOGO_JPEG_QUALITY
+
+
+def generate_logo_variant(logo, variant):
+    """
+    Resize and compress the logo image to the given variant size.
+    Transparent logos are kept as PNG, other logos are converted to JPEG.
+    """
+    logo.seek(0)
+    with Image.open(logo) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(LOGO_VARIANTS[variant], Image.Resampling.LANCZOS)
+
+        buffer = BytesIO()
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        if has_alpha:
+            image.convert("RGBA").save(buffer, format="PNG", optimize=True)
+            extension = "png"
+        else:
+            image.convert("RGB").save(
+                buffer,
+                format="JPEG",
+                quality=LOGO_JPEG_QUALITY,
+                optimize=True,
+                progressive=True,
+            )
+            extension = "jpg"
+
+    logo.seek(0)
+    name = os.path.splitext(os.path.basename(logo.name))[0]
+    return ContentFile(buffer.getvalue(), name=f"{name}_{variant}.{extension}")
+
+
+def delete_logo_variants(variants):
+    """
+    Delete the files of the replaced logo variants
+    """
+    for variant in variants:
+        variant.storage.delete(variant.name)
+
+
+def logo_file_version(logo):
+    """
+    Size and modification time of the logo file, a file replaced under the
+    same name gets another version
+    """
+    try:
+        modified = logo.storage.get_modified_time(logo.name).timestamp()
+    except NotImplementedError:
+        modified = 0
+    return f"{logo.size}-{modified:.0f}"
+
+
+def logo_data_uri(logo):
+    """
+    Return the logo image as a data URI, cached by file name and version
+    """
+    if not logo:
+        return None
+
+    def build():
+        with logo.open("rb") as file:
+            content = file.read()
+        extension = os.path.splitext(logo.name)[1].lower()
+        mime_type = "image/png" if extension == ".png" else "image/jpeg"
+        return f"data:{mime_type};base64,{b64encode(content).decode('utf-8')}"
+
+    return get_or_set(
+        f"logo_data_uri:{logo.name}:{logo_file_version(logo)}",
+        build,
+        LOGO_DATA_URI_TIMEOUT,
+        name="logo_data_uri",
+    )
@@ -1,9 +1,8 @@
 from rest_framework import permissions
-from django.utils import timezone
 from rest_framework.exceptions import PermissionDenied
 from django.conf import settings
+from .entitlements import get_entitlement
 
-FREE_PERIOD = settings.FREE_PERIOD
 DAYS_BEFORE_RENEWAL = settings.DAYS_BEFORE_RENEWAL
 
 
@@ -15,7 +14,7 @@ class IsEmailVerified(permissions.BasePermission):
     message = "Your email is not verified. Please verify your email."
 
     def has_permission(self, request, view):
-        return request.user.email_verified
+        return get_entitlement(request).email_verified
 
 
 class IsAccountCompleted(permissions.BasePermission):
@@ -27,7 +26,7 @@ class IsAccountCompleted(permissions.BasePermission):
 
     def has_permission(self, request, view):
         # Check if the user's account is completed
-        return request.user.profile_completed
+        return get_entitlement(request).profile_completed
 
 
 class IsSubscriptionActive(permissions.BasePermission):
@@ -35,24 +34,12 @@ class IsSubscriptionActive(permissions.BasePermission):
     Custom permission to check if a user's subscription is active.
     """
 
-    def is_active_before_pending(self, user):
-        """
-        Check if the last completed payment is active before the last pending payment.
-        """
-
-        last_completed_payment = user.subscriptions.filter(status="completed").last()
-        return (
-            (not last_completed_payment.is_expiry) if last_completed_payment else None
-        )
-
     def has_permission(self, request, view):
-        user = request.user
+        entitlement = get_entitlement(request)
 
         # check last created payment
-        last_payment = user.subscriptions.last()
-
-        free_days_ago = user.date_joined + timezone.timedelta(days=FREE_PERIOD)
-        free_tier_active = timezone.now() <= free_days_ago
+        last_payment = entitlement.last_payment
+        free_tier_active = entitlement.free_tier_active
 
         if last_payment is None or free_tier_active:
             if free_tier_active:
@@ -60,7 +47,8 @@ class IsSubscriptionActive(permissions.BasePermission):
             raise PermissionDenied("Your free trial period has ended.")
 
         elif last_payment.status == "pending":
-            if self.is_active_before_pending(user):
+            # the last completed payment is active before the last pending payment
+            if entitlement.last_completed_payment_active:
                 return True
 
             raise PermissionDenied(
@@ -86,8 +74,7 @@ class CanCreatePayment(permissions.BasePermission):
 
     def has_permission(self, request, view):
         if request.method == "POST":
-            user = request.user
-            last_payment = user.subscriptions.last()
+            last_payment = get_entitlement(request).last_payment
 
             # Check if the user's free trial period is over
             if last_payment is None:
@@ -0,0 +1,239 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.validators import validate_email
+from django.db import transaction
+
+from accounts.models import Account
+from .constants import (
+    PROVISION_BATCH_SIZE,
+    PROVISION_CSV_FIELDS,
+    PROVISION_EMAIL_BATCH_SIZE,
+)
+from .utils import are_required_fields_filled
+from .validators import NumericLengthValidator
+
+User = get_user_model()
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _error_messages(error: ValidationError):
+    return list(error.messages)
+
+
+# the uploaded CSV files hold plaintext passwords, they're kept out of MEDIA_ROOT
+provisioning_storage = FileSystemStorage(
+    location=os.path.join(settings.PRIVATE_ROOT, "provisioning"),
+    file_permissions_mode=0o600,
+    directory_permissions_mode=0o700,
+)
+
+
+def provision_job_files(job_id):
+    """
+    provisioning_storage paths of the uploaded CSV file and of the JSON report
+    of a provisioning job
+    """
+    return f"{job_id}.csv", f"reports/{job_id}.json"
+
+
+class MerchantProvisioner:
+    """
+    Create merchants (user + account) in bulk from a CSV stream.
+
+    Rows are processed in batches: one query checks the existing emails,
+    passwords are hashed in a process pool (in the calling process with
+    workers=0, e.g. in a Celery worker) and users and accounts are
+    inserted with ``bulk_create``. ``bulk_create`` does not send the
+    ``post_save`` signals, so the account and ``profile_completed`` flag
+    are built here instead of in ``accounts.services.signals``.
+    """
+
+    def __init__(
+        self, batch_size=PROVISION_BATCH_SIZE, workers=None, send_emails=True
+    ):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.send_emails = send_emails
+        self.created = 0
+        self.errors = []
+
+    def run(self, stream):
+        """
+        Provision all the merchants in the CSV text stream and return the report
+        """
+        reader = csv.DictReader(stream)
+        self.check_columns(reader.fieldnames)
+
+        # line 1 is the header row
+        rows = enumerate(reader, start=2)
+        if self.workers == 0:
+            for batch in _chunks(rows, self.batch_size):
+                self.provision_batch(batch, None)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=django.setup
+            ) as executor:
+                for batch in _chunks(rows, self.batch_size):
+                    self.provision_batch(batch, executor)
+
+        return self.report()
+
+    @staticmethod
+    def check_columns(fieldnames):
+        """
+        Raise ValidationError when the CSV header misses a required column
+        """
+        missing_columns = {"email", "password"} - set(fieldnames or [])
+        if missing_columns:
+            raise ValidationError(
+                f"CSV file is missing the required columns: {', '.join(sorted(missing_columns))}"
+            )
+
+    def report(self):
+        return {
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": self.errors,
+        }
+
+    def add_error(self, line, email, errors):
+        self.errors.append({"row": line, "email": email, "errors": errors})
+
+    def clean_row(self, row):
+        """
+        Validate a CSV row and return the cleaned data, raise ValidationError otherwise
+        """
+        errors = {}
+        data = {
+            field: (row.get(field) or "").strip() or None
+            for field in PROVISION_CSV_FIELDS
+        }
+        data["email"] = User.objects.normalize_email(data["email"] or "")
+
+        try:
+            validate_email(data["email"])
+        except ValidationError as e:
+            errors["email"] = _error_messages(e)
+
+        try:
+            validate_password(data["password"] or "", User(email=data["email"]))
+        except ValidationError as e:
+            errors["password"] = _error_messages(e)
+
+        if data["tax_number"]:
+            try:
+                NumericLengthValidator(field_name="Tax Number", length=15)(
+                    data["tax_number"]
+                )
+            except ValidationError as e:
+                errors["tax_number"] = _error_messages(e)
+
+        taxable = (data["taxable"] or "true").lower()
+        if taxable in TRUE_VALUES:
+            data["taxable"] = True
+        elif taxable in FALSE_VALUES:
+            data["taxable"] = False
+        else:
+            errors["taxable"] = ["Taxable must be true or false."]
+
+        if errors:
+            raise ValidationError(errors)
+
+        return data
+
+    def provision_batch(self, batch, executor):
+        candidates = {}
+        for line, row in batch:
+            try:
+                data = self.clean_row(row)
+            except ValidationError as e:
+                self.add_error(line, row.get("email"), e.message_dict)
+                continue
+
+            if data["email"] in candidates:
+                self.add_error(
+                    line, data["email"], {"email": ["Email is duplicated in the file."]}
+                )
+                continue
+            candidates[data["email"]] = (line, data)
+
+        existing_emails = set(
+            User.objects.filter(email__in=candidates.keys()).values_list(
+                "email", flat=True
+            )
+        )
+        for email in existing_emails:
+            line, _ = candidates.pop(email)
+            self.add_error(line, email, {"email": ["Email already exists."]})
+
+        if not candidates:
+            return
+
+        rows = list(candidates.values())
+        raw_passwords = [data["password"] for _, data in rows]
+        if executor is None:
+            passwords = map(make_password, raw_passwords)
+        else:
+            passwords = executor.map(
+                make_password,
+                raw_passwords,
+                chunksize=max(len(rows) // ((self.workers or os.cpu_count()) * 4), 1),
+            )
+
+        users, accounts = [], []
+        for (_, data), password in zip(rows, passwords):
+            account = Account(
+                organization=data["organization"],
+                register_number=data["register_number"],
+                tax_number=data["tax_number"],
+                city=data["city"],
+                street=data["street"],
+                phone=data["phone"],
+                taxable=data["taxable"],
+                vat=Decimal("15.0") if data["taxable"] else Decimal("0.0"),
+            )
+            user = User(
+                email=data["email"],
+                password=password,
+                profile_completed=are_required_fields_filled(account),
+            )
+            users.append(user)
+            accounts.append(account)
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+            for user, account in zip(users, accounts):
+                account.user = user
+            Account.objects.bulk_create(accounts, batch_size=self.batch_size)
+
+            if self.send_emails:
+                transaction.on_commit(
+                    lambda: self.queue_verify_emails([user.email for user in users])
+                )
+
+        self.created += len(users)
+
+    def queue_verify_emails(self, emails):
+        from authentication.emails import verify_emails_batch_task
+
+        for batch in _chunks(emails, PROVISION_EMAIL_BATCH_SIZE):
+            verify_emails_batch_task.delay(batch)
@@ -1,11 +1,16 @@
-from accounts.models import Account
-from django.db.models.signals import post_save
+from accounts.models import Account, Package, PaymentHistory
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from invoices.models import SigningCredential
 from .utils import are_required_fields_filled
+from .cache import invalidate_account_profile, invalidate_packages
 
 User = get_user_model()
 
+# user fields read by the account profile (email check, free tier, subscription)
+PROFILE_USER_FIELDS = {"email_verified", "profile_completed", "date_joined"}
+
 
 @receiver(post_save, sender=User)
 def create_user_account(sender, instance, created, **kwargs):
@@ -19,3 +24,36 @@ def update_profile_completed(sender, instance: Account, created, **kwargs):
         if are_required_fields_filled(instance):
             instance.user.profile_completed = True
             instance.user.save(update_fields=["profile_completed"])
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=PaymentHistory)
+@receiver(post_delete, sender=PaymentHistory)
+def clear_account_profile_cache(sender, instance, **kwargs):
+    invalidate_account_profile(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def clear_user_profile_cache(sender, instance, update_fields=None, **kwargs):
+    # the last_login update of every login doesn't change the profile
+    if update_fields is None or PROFILE_USER_FIELDS.intersection(update_fields):
+        invalidate_account_profile(instance.pk)
+
+
+@receiver(post_save, sender=SigningCredential)
+@receiver(post_delete, sender=SigningCredential)
+def clear_signing_profile_cache(sender, instance, **kwargs):
+    # the ZATCA configuration of the account, the account is gone when deleted with it
+    user_id = (
+        Account.objects.filter(pk=instance.account_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    if user_id is not None:
+        invalidate_account_profile(user_id)
+
+
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+def clear_packages_cache(sender, instance, **kwargs):
+    invalidate_packages()
@@ -0,0 +1,127 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+from core.metrics import THROTTLED_REQUESTS
+
+PERIODS = {"s": 1, "sec": 1, "min": 60, "hour": 3600, "day": 86400}
+
+# Atomic token bucket, the bucket is a hash of (tokens, timestamp).
+# Returns the number of seconds to wait, 0 when the request is allowed.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * refill_rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'timestamp', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate) + 1)
+return tostring(wait)
+"""
+
+
+def parse_rate(rate):
+    """
+    Parse a rate like "60/min" into (capacity, refill rate in tokens per second)
+    """
+    try:
+        num, period = rate.split("/")
+        capacity = int(num)
+        return capacity, capacity / PERIODS[period]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f"Invalid throttle rate '{rate}'")
+
+
+class AccountRateThrottle(BaseThrottle):
+    """
+    Token bucket throttle per account and endpoint scope.
+    The buckets live in the shared cache so the limits hold across all the
+    workers, with Redis the bucket is updated atomically by a Lua script.
+    A user has exactly one account, so the user id identifies the account
+    without loading it.
+    """
+
+    scope = None
+    cache = cache
+
+    def __init__(self):
+        if self.scope not in settings.ACCOUNT_THROTTLE_RATES:
+            raise ImproperlyConfigured(
+                f"No account throttle rate set for scope '{self.scope}'"
+            )
+        self.capacity, self.refill_rate = parse_rate(
+            settings.ACCOUNT_THROTTLE_RATES[self.scope]
+        )
+        self._wait = None
+
+    def get_cache_key(self, ident):
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        if not request.user.is_authenticated:
+            return True
+        return self.allow(request.user.pk)
+
+    def allow(self, ident):
+        """
+        Take a token from the account bucket, return False when the bucket is empty
+        """
+        key = self.get_cache_key(ident)
+        now = time.time()
+        client = self.get_redis_client()
+        if client is not None:
+            self._wait = float(
+                client.eval(
+                    TOKEN_BUCKET_SCRIPT,
+                    1,
+                    self.cache.make_key(key),
+                    self.capacity,
+                    self.refill_rate,
+                    now,
+                )
+            )
+        else:
+            self._wait = self.take_token(key, now)
+
+        if self._wait > 0:
+            THROTTLED_REQUESTS.labels(scope=self.scope).inc()
+            return False
+        return True
+
+    def get_redis_client(self):
+        backend = getattr(self.cache, "_cache", None)
+        if hasattr(backend, "get_client"):
+            return backend.get_client(write=True)
+        return None
+
+    def take_token(self, key, now):
+        """
+        Non atomic token bucket for the cache backends without scripting
+        (local memory cache in development and tests)
+        """
+        tokens, timestamp = self.cache.get(key, (self.capacity, now))
+        tokens = min(
+            self.capacity, tokens + max(0, now - timestamp) * self.refill_rate
+        )
+        wait = 0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.refill_rate
+
+        self.cache.set(
+            key, (tokens, now), int(self.capacity / self.refill_rate) + 1
+        )
+        return wait
+
+    def wait(self):
+        return self._wait
@@ -1,5 +1,10 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
+from core.transactions import write_atomic
 from .constants import ACCOUNT_REQUIRED_FIELDS
+from .cache import invalidate_account_profiles
 from django.conf import settings
 
 FREE_PERIOD = settings.FREE_PERIOD
@@ -29,3 +34,76 @@ def check_subscription_status(user):
         "last_payment": last_payment,
         "last_payment_active": last_payment_active,
     }
+
+
+def approve_payments(payments):
+    """
+    Complete the pending payments of the queryset in one pass, the same
+    expiration dates as saving them one by one in creation order:
+    each payment starts at the end of the free tier, or of the user's last
+    completed payment when it is still active, or now.
+    Return the number of approved payments.
+    """
+    from accounts.models import PaymentHistory
+
+    now = timezone.now()
+    with write_atomic():
+        pending = list(
+            payments.select_for_update(of=("self",))
+            .filter(status="pending")
+            .select_related("user")
+            .order_by("created_at")
+        )
+        if not pending:
+            return 0
+
+        # (created_at, expiration_date) of the last completed payment of every
+        # user, the head of the user's chain, one correlated row per user
+        last_completed = PaymentHistory.objects.filter(
+            user_id=OuterRef("pk"), status="completed"
+        ).order_by("-created_at", "-pk")[:1]
+        last_payments = {
+            user_id: (created_at, expiration_date)
+            for user_id, created_at, expiration_date in get_user_model()
+            .objects.filter(pk__in={payment.user_id for payment in pending})
+            .annotate(
+                last_created_at=Subquery(last_completed.values("created_at")),
+                last_expiration_date=Subquery(last_completed.values("expiration_date")),
+            )
+            .filter(last_created_at__isnull=False)
+            .values_list("pk", "last_created_at", "last_expiration_date")
+        }
+
+        for payment in pending:
+            free_days_ago = payment.user.date_joined + timezone.timedelta(
+                days=FREE_PERIOD
+            )
+            last_created_at, last_expiration_date = last_payments.get(
+                payment.user_id, (None, None)
+            )
+
+            start_date = now
+            if now <= free_days_ago:
+                start_date = free_days_ago
+            elif last_expiration_date and last_expiration_date >= now:
+                start_date = last_expiration_date
+
+            payment.status = "completed"
+            payment.completed_at = now
+            payment.expiration_date = start_date + timezone.timedelta(
+                days=payment.duration * 30
+            )
+            if last_created_at is None or last_created_at <= payment.created_at:
+                last_payments[payment.user_id] = (
+                    payment.created_at,
+                    payment.expiration_date,
+                )
+
+        PaymentHistory.objects.bulk_update(
+            pending, ["status", "completed_at", "expiration_date"]
+        )
+        transaction.on_commit(
+            lambda: invalidate_account_profiles({p.user_id for p in pending})
+        )
+
+    return len(pending)
@@ -0,0 +1,66 @@
+from celery import shared_task
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.utils import timezone
+import datetime
+import io
+import json
+from accounts.services.constants import PROVISION_UPLOAD_MAX_AGE
+from accounts.services.provisioning import (
+    MerchantProvisioner,
+    provision_job_files,
+    provisioning_storage,
+)
+
+
+def save_provision_report(report_path, report):
+    provisioning_storage.save(
+        report_path, ContentFile(json.dumps(report).encode("utf-8"))
+    )
+
+
+@shared_task(name="provision_merchants_task")
+def provision_merchants_task(job_id):
+    """
+    Provision the merchants of the uploaded CSV file and store the JSON report,
+    the passwords are hashed in the worker process (the prefork workers are daemon
+    processes, they can't start a process pool).
+    The CSV file holds plaintext passwords, it's deleted whatever happens.
+    """
+    csv_path, report_path = provision_job_files(job_id)
+    try:
+        with provisioning_storage.open(csv_path, "rb") as file:
+            report = MerchantProvisioner(workers=0).run(
+                io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+            )
+        report["status"] = "completed"
+    except ValidationError as e:
+        report = {"status": "failed", "file": e.messages}
+    except Exception:
+        save_provision_report(
+            report_path, {"status": "failed", "error": "The provisioning job failed"}
+        )
+        raise
+    finally:
+        provisioning_storage.delete(csv_path)
+
+    save_provision_report(report_path, report)
+    return {key: value for key, value in report.items() if key != "errors"}
+
+
+@shared_task(name="purge_provisioning_uploads")
+def purge_provisioning_uploads():
+    """
+    Delete the uploaded CSV files older than PROVISION_UPLOAD_MAX_AGE, left
+    behind by a worker killed while provisioning them
+    """
+    if not provisioning_storage.exists(""):
+        return 0
+
+    limit = timezone.now() - datetime.timedelta(seconds=PROVISION_UPLOAD_MAX_AGE)
+    purged = 0
+    for name in provisioning_storage.listdir("")[1]:
+        if name.endswith(".csv") and provisioning_storage.get_modified_time(name) < limit:
+            provisioning_storage.delete(name)
+            purged += 1
+    return purged
@@ -1,3 +1,127 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from .models import PaymentHistory
+from .services.utils import approve_payments
 
-# Create your tests here.
+User = get_user_model()
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0, 0)
+MONTH = datetime.timedelta(days=30)
+
+
+class ApprovePaymentsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("django.utils.timezone.now", return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_user(self, email, joined_days_ago=60):
+        return User.objects.create(
+            email=email, date_joined=NOW - datetime.timedelta(days=joined_days_ago)
+        )
+
+    def create_payment(self, user, duration, hours_ago, **kwargs):
+        return PaymentHistory.objects.create(
+            user=user,
+            duration=duration,
+            amount=Decimal("100.00"),
+            created_at=NOW - datetime.timedelta(hours=hours_ago),
+            **kwargs,
+        )
+
+    def approve(self, *payments):
+        approved = approve_payments(
+            PaymentHistory.objects.filter(pk__in=[payment.pk for payment in payments])
+        )
+        for payment in payments:
+            payment.refresh_from_db()
+        return approved
+
+    def test_pending_payments_of_a_user_are_chained(self):
+        user = self.create_user("chained@example.com")
+        second = self.create_payment(user, 2, hours_ago=1)
+        first = self.create_payment(user, 1, hours_ago=2)
+
+        self.assertEqual(self.approve(first, second), 2)
+
+        self.assertEqual(first.status, "completed")
+        self.assertEqual(first.completed_at, NOW)
+        self.assertEqual(first.expiration_date, NOW + MONTH)
+        self.assertEqual(second.expiration_date, NOW + 3 * MONTH)
+
+    def test_payment_starts_at_the_end_of_the_active_payment(self):
+        user = self.create_user("active@example.com")
+        active_until = NOW + datetime.timedelta(days=10)
+        self.create_payment(
+            user, 1, hours_ago=24, status="completed", expiration_date=active_until
+        )
+        payment = self.create_payment(user, 1, hours_ago=1)
+
+        self.approve(payment)
+
+        self.assertEqual(payment.expiration_date, active_until + MONTH)
+
+    def test_payment_after_an_expired_payment_starts_now(self):
+        user = self.create_user("expired@example.com")
+        self.create_payment(
+            user,
+            1,
+            hours_ago=24 * 40,
+            status="completed",
+            expiration_date=NOW - datetime.timedelta(days=10),
+        )
+        payment = self.create_payment(user, 1, hours_ago=1)
+
+        self.approve(payment)
+
+        self.assertEqual(payment.expiration_date, NOW + MONTH)
+
+    def test_payments_in_the_free_period_start_at_its_end(self):
+        user = self.create_user("free@example.com", joined_days_ago=2)
+        free_until = user.date_joined + datetime.timedelta(days=settings.FREE_PERIOD)
+        first = self.create_payment(user, 1, hours_ago=2)
+        second = self.create_payment(user, 1, hours_ago=1)
+
+        self.approve(first, second)
+
+        # like saving them one by one, the free period wins over the chain
+        self.assertEqual(first.expiration_date, free_until + MONTH)
+        self.assertEqual(second.expiration_date, free_until + MONTH)
+
+    def test_same_expirations_as_saving_one_by_one(self):
+        approved_user = self.create_user("approved@example.com")
+        saved_user = self.create_user("saved@example.com")
+        approved, saved = [], []
+        for user, payments in ((approved_user, approved), (saved_user, saved)):
+            self.create_payment(
+                user,
+                1,
+                hours_ago=24,
+                status="completed",
+                expiration_date=NOW + datetime.timedelta(days=5),
+            )
+            for hours_ago, duration in ((3, 1), (2, 6), (1, 3)):
+                payments.append(self.create_payment(user, duration, hours_ago))
+
+        self.approve(*approved)
+        for payment in saved:
+            payment.status = "completed"
+            payment.save()
+
+        self.assertEqual(
+            [payment.expiration_date for payment in approved],
+            [payment.expiration_date for payment in saved],
+        )
+
+    def test_only_pending_payments_are_approved(self):
+        user = self.create_user("not_active@example.com")
+        payment = self.create_payment(user, 1, hours_ago=1, status="not_active")
+
+        self.assertEqual(self.approve(payment), 0)
+
+        self.assertEqual(payment.status, "not_active")
+        self.assertIsNone(payment.expiration_date)
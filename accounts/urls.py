@@ -5,4 +5,12 @@ urlpatterns = [
     path("", views.AccountDetailView.as_view(), name="account-create"),
     path("payments/", views.PaymentListAPIView.as_view(), name="payment-list"),
     path("packages/", views.PackageListAPIView.as_view(), name="package-list"),
+    path(
+        "provision/", views.MerchantProvisionView.as_view(), name="merchant-provision"
+    ),
+    path(
+        "provision/<uuid:job_id>/",
+        views.MerchantProvisionReportView.as_view(),
+        name="merchant-provision-report",
+    ),
 ]
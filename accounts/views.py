@@ -1,5 +1,10 @@
 from rest_framework import generics, status, permissions
-from .serializers import AccountSerializer, PaymentSerializer, PackageSerializer
+from .serializers import (
+    AccountSerializer,
+    PaymentSerializer,
+    PackageSerializer,
+    MerchantProvisionSerializer,
+)
 from rest_framework.response import Response
 from .models import PaymentHistory
 from accounts.services.permissions import (
@@ -8,6 +13,20 @@ from accounts.services.permissions import (
     CanCreatePayment,
 )
 from rest_framework.parsers import FormParser, MultiPartParser
+from accounts.services.provisioning import (
+    MerchantProvisioner,
+    provision_job_files,
+    provisioning_storage,
+)
+from accounts.tasks import provision_merchants_task
+from accounts.services.cache import get_account_profile, package_list
+from django.utils.http import parse_etags
+from django.core.exceptions import ValidationError
+from django.http import Http404
+import csv
+import io
+import json
+import uuid
 
 
 class AccountDetailView(generics.RetrieveUpdateAPIView):
@@ -27,6 +46,21 @@ class AccountDetailView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user.account
 
+    def retrieve(self, request, *args, **kwargs):
+        # The profile snapshot is cached per user, so unchanged profiles are
+        # served without loading the account or its subscriptions
+        snapshot = get_account_profile(
+            request.user.pk, lambda: self.get_serializer(self.get_object()).data
+        )
+        etag = f'"{snapshot["etag"]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(snapshot["data"], headers=headers)
+
 
 class PaymentListAPIView(generics.ListCreateAPIView):
     """
@@ -60,8 +94,67 @@ class PackageListAPIView(generics.ListAPIView):
 
     serializer_class = PackageSerializer
     queryset = PackageSerializer.Meta.model.objects.all()
+    use_read_replica = True
     permission_classes = [
         permissions.IsAuthenticated,
         IsEmailVerified,
         IsAccountCompleted,
     ]
+
+    def list(self, request, *args, **kwargs):
+        return Response(package_list())
+
+
+class MerchantProvisionView(generics.GenericAPIView):
+    """
+    Queue the creation of merchants in bulk from a reseller CSV file, return the job id
+    Permissions: IsAdminUser
+    """
+
+    serializer_class = MerchantProvisionSerializer
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data["file"]
+
+        # reject a file without the required columns before queueing it
+        header = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        try:
+            MerchantProvisioner.check_columns(next(csv.reader(header), None))
+        except ValidationError as e:
+            return Response({"file": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            header.detach()
+        file.seek(0)
+
+        job_id = str(uuid.uuid4())
+        csv_path, _ = provision_job_files(job_id)
+        provisioning_storage.save(csv_path, file)
+        provision_merchants_task.apply_async((job_id,), task_id=job_id)
+
+        return Response(
+            {"job": job_id, "status": "queued"}, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class MerchantProvisionReportView(generics.GenericAPIView):
+    """
+    Return the per-row error report of a provisioning job once it is completed
+    Permissions: IsAdminUser
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, job_id):
+        csv_path, report_path = provision_job_files(job_id)
+        if provisioning_storage.exists(report_path):
+            with provisioning_storage.open(report_path) as file:
+                return Response(json.load(file))
+        if provisioning_storage.exists(csv_path):
+            return Response(
+                {"job": str(job_id), "status": "queued"}, status=status.HTTP_202_ACCEPTED
+            )
+        raise Http404
@@ -0,0 +1,102 @@
+from collections import defaultdict
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from .models import AccountInvoiceVolume, PackageRevenue, SubscriptionSnapshot
+from .services.rollups import ANALYTICS_REFRESH_MONTHS
+
+DASHBOARD_MONTHS = 12
+DASHBOARD_TOP_ACCOUNTS = 20
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """
+    The rollups are written by the refresh_analytics task only
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PackageRevenue)
+class PackageRevenueAdmin(RollupAdmin):
+    """
+    The changelist is the analytics dashboard, it only reads the rollup tables
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        months = list(
+            PackageRevenue.objects.values_list("month", flat=True)
+            .distinct()
+            .order_by("-month")[:DASHBOARD_MONTHS]
+        )
+        revenues = PackageRevenue.objects.filter(month__in=months)
+        packages = sorted({revenue.package_name for revenue in revenues})
+
+        by_month = defaultdict(dict)
+        for revenue in revenues:
+            by_month[revenue.month][revenue.package_name] = revenue.revenue
+        revenue_rows = [
+            {
+                "month": month,
+                "packages": [by_month[month].get(package, 0) for package in packages],
+                "total": sum(by_month[month].values()),
+            }
+            for month in months
+        ]
+
+        latest_month = (
+            AccountInvoiceVolume.objects.order_by("-month")
+            .values_list("month", flat=True)
+            .first()
+        )
+        top_accounts = (
+            AccountInvoiceVolume.objects.filter(month=latest_month)
+            .select_related("account__user")
+            .order_by("-invoices")[:DASHBOARD_TOP_ACCOUNTS]
+        )
+        snapshots = list(SubscriptionSnapshot.objects.all()[:30])
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Analytics dashboard",
+            "opts": self.model._meta,
+            "packages": packages,
+            "revenue_rows": revenue_rows,
+            "latest_month": latest_month,
+            "top_accounts": top_accounts,
+            "subscription": snapshots[0] if snapshots else None,
+            "snapshots": snapshots,
+            "refresh_months": ANALYTICS_REFRESH_MONTHS,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, "admin/analytics/dashboard.html", context)
+
+
+@admin.register(AccountInvoiceVolume)
+class AccountInvoiceVolumeAdmin(RollupAdmin):
+    list_display = [
+        "month",
+        "account",
+        "invoices",
+        "credit_invoices",
+        "total_after_vat",
+        "updated_at",
+    ]
+    list_select_related = ["account__user"]
+    list_filter = ["month"]
+    search_fields = ["account__user__email"]
+
+
+@admin.register(SubscriptionSnapshot)
+class SubscriptionSnapshotAdmin(RollupAdmin):
+    list_display = ["day", "active", "expired", "pending", "created_at"]
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from analytics.services.rollups import ANALYTICS_REFRESH_MONTHS, refresh_analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the admin dashboard rollups of the recent months"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=ANALYTICS_REFRESH_MONTHS,
+            help="Number of months to rebuild, the current month included "
+            "(use a large value once to backfill the history)",
+        )
+
+    def handle(self, *args, **options):
+        if options["months"] < 1:
+            raise CommandError("--months must be at least 1")
+
+        result = refresh_analytics(options["months"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {result['package_revenue']} package revenue and "
+                f"{result['invoice_volume']} invoice volume rows"
+            )
+        )
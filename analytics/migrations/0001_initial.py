@@ -0,0 +1,72 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0011_alter_paymenthistory_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountInvoiceVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('invoices', models.PositiveIntegerField(default=0)),
+                ('credit_invoices', models.PositiveIntegerField(default=0)),
+                ('total_after_vat', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month', '-invoices'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PackageRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('package_name', models.CharField(max_length=100)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month', 'package_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubscriptionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('active', models.PositiveIntegerField(default=0)),
+                ('expired', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='packagerevenue',
+            constraint=models.UniqueConstraint(fields=('month', 'package_name'), name='unique_package_revenue_month'),
+        ),
+        migrations.AddField(
+            model_name='accountinvoicevolume',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_volumes', to='accounts.account'),
+        ),
+        migrations.AddConstraint(
+            model_name='accountinvoicevolume',
+            constraint=models.UniqueConstraint(fields=('month', 'account'), name='unique_account_invoice_volume_month'),
+        ),
+    ]
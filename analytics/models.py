@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+from accounts.models import Account
+
+
+class PackageRevenue(models.Model):
+    """
+    Completed payments per package and month, refreshed by the refresh_analytics task
+    """
+
+    month = models.DateField(help_text="First day of the month")
+    package_name = models.CharField(max_length=100)
+    payments = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-month", "package_name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "package_name"], name="unique_package_revenue_month"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.package_name} {self.month:%Y-%m}"
+
+
+class AccountInvoiceVolume(models.Model):
+    """
+    Invoices issued per account and month, refreshed by the refresh_analytics task
+    """
+
+    month = models.DateField(help_text="First day of the month")
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="invoice_volumes"
+    )
+    invoices = models.PositiveIntegerField(default=0)
+    credit_invoices = models.PositiveIntegerField(default=0)
+    total_after_vat = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-month", "-invoices"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "account"], name="unique_account_invoice_volume_month"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.month:%Y-%m}"
+
+
+class SubscriptionSnapshot(models.Model):
+    """
+    Subscribed users by state at the refresh time, one row per day
+    """
+
+    day = models.DateField(unique=True)
+    active = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-day"]
+
+    def __str__(self):
+        return str(self.day)
@@ -0,0 +1,132 @@
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from accounts.models import PaymentHistory
+from analytics.models import AccountInvoiceVolume, PackageRevenue, SubscriptionSnapshot
+from invoices.models import Invoice
+
+ANALYTICS_REFRESH_MONTHS = settings.ANALYTICS_REFRESH_MONTHS
+
+
+def window_start(months):
+    """
+    First day of the oldest month of the refresh window (the current month included)
+    """
+    today = timezone.now().date()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def window_filter(since, field="created_at"):
+    start = datetime.datetime.combine(since, datetime.time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return {f"{field}__gte": start}
+
+
+def refresh_package_revenue(since):
+    """
+    Rebuild the package revenue rollup of the months since `since`, the revenue
+    is counted in the month the payment was completed (approved)
+    """
+    rows = (
+        PaymentHistory.objects.filter(
+            status="completed", **window_filter(since, "completed_at")
+        )
+        .annotate(month=TruncMonth("completed_at", output_field=DateField()))
+        .values("month", "package_name")
+        .annotate(payments=Count("id"), revenue=Sum("amount"))
+        .order_by()
+    )
+    rollups = [
+        PackageRevenue(
+            month=row["month"],
+            package_name=row["package_name"] or "",
+            payments=row["payments"],
+            revenue=row["revenue"] or 0,
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        PackageRevenue.objects.filter(month__gte=since).delete()
+        PackageRevenue.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def refresh_invoice_volume(since):
+    """
+    Rebuild the account invoice volume rollup of the months since `since`
+    """
+    rows = (
+        Invoice.objects.filter(document_type="invoice", **window_filter(since))
+        .annotate(month=TruncMonth("created_at", output_field=DateField()))
+        .values("month", "account_id")
+        .annotate(
+            invoices=Count("id"),
+            credit_invoices=Count("id", filter=Q(invoice_code="credit")),
+            total_after_vat=Sum("total_after_vat"),
+        )
+        .order_by()
+    )
+    rollups = [
+        AccountInvoiceVolume(
+            month=row["month"],
+            account_id=row["account_id"],
+            invoices=row["invoices"],
+            credit_invoices=row["credit_invoices"],
+            total_after_vat=row["total_after_vat"] or 0,
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        AccountInvoiceVolume.objects.filter(month__gte=since).delete()
+        AccountInvoiceVolume.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def refresh_subscription_snapshot(since):
+    """
+    Count the subscribed users by state and store today's snapshot, only the
+    payments expiring since `since` are read (indexed expiration_date)
+     - active: a completed payment not expired yet
+     - expired: the last subscription expired since `since`
+     - pending: payments waiting for approval
+    """
+    completed = PaymentHistory.objects.filter(
+        status="completed", **window_filter(since, "expiration_date")
+    )
+    subscribed = completed.values("user_id").distinct().count()
+    active = (
+        completed.filter(expiration_date__gte=timezone.now())
+        .values("user_id")
+        .distinct()
+        .count()
+    )
+    snapshot, _ = SubscriptionSnapshot.objects.update_or_create(
+        day=timezone.now().date(),
+        defaults={
+            "active": active,
+            "expired": subscribed - active,
+            "pending": PaymentHistory.objects.filter(status="pending").count(),
+            "created_at": timezone.now(),
+        },
+    )
+    return snapshot
+
+
+def refresh_analytics(months=ANALYTICS_REFRESH_MONTHS):
+    """
+    Refresh the rollups of the last `months` months, older months don't change
+    and are left as they are (use a larger window to backfill them)
+    """
+    since = window_start(months)
+    return {
+        "package_revenue": refresh_package_revenue(since),
+        "invoice_volume": refresh_invoice_volume(since),
+        "subscriptions": refresh_subscription_snapshot(since).pk,
+    }
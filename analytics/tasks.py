@@ -0,0 +1,10 @@
+from celery import shared_task
+from analytics.services.rollups import refresh_analytics
+
+
+@shared_task(name="refresh_analytics")
+def refresh_analytics_task():
+    """
+    Refresh the admin dashboard rollups of the recent months
+    """
+    return refresh_analytics()
@@ -33,34 +33,51 @@ def send_email_task(data):
         print(f"Failed to send email =>> Error: {str(e)}")
 
 
+def send_verify_email(user):
+    token = RefreshToken.for_user(user).access_token
+    user_name = user.email.split("@")[0]
+    verify_url = SITE_URL + "/api/auth/email/verify/?token=" + str(token)
+
+    email_body = (
+        "Hello "
+        + str(user_name)
+        + "\n Use the URL below to verify your email \n"
+        + str(verify_url)
+        + "\n The URL will be expired in 15 minutes"
+        + "\n\n  If you didn't request this, please ignore this email."
+        + "\n Best regards, FatooraPro Team"
+    )
+    data = {
+        "email_body": email_body,
+        "to_email": user.email,
+        "email_subject": "Verify your email",
+    }
+    send_email_task(data)
+
+
 @shared_task(name="verify_email_task")
 def verify_email_task(user_email):
     try:
         user = User.objects.get(email=user_email)
-        token = RefreshToken.for_user(user).access_token
-        user_name = user.email.split("@")[0]
-        verify_url = SITE_URL + "/api/auth/email/verify/?token=" + str(token)
-
-        email_body = (
-            "Hello "
-            + str(user_name)
-            + "\n Use the URL below to verify your email \n"
-            + str(verify_url)
-            + "\n The URL will be expired in 15 minutes"
-            + "\n\n  If you didn't request this, please ignore this email."
-            + "\n Best regards, FatooraPro Team"
-        )
-        data = {
-            "email_body": email_body,
-            "to_email": user.email,
-            "email_subject": "Verify your email",
-        }
-        send_email_task(data)
+        send_verify_email(user)
     except Exception as e:
         # Handle exceptions
         print(f"Failed to send email =>> Error: {str(e)}")
 
 
+@shared_task(name="verify_emails_batch_task")
+def verify_emails_batch_task(user_emails):
+    """
+    Send verification emails for a batch of users with a single users query
+    """
+    for user in User.objects.filter(email__in=user_emails, email_verified=False):
+        try:
+            send_verify_email(user)
+        except Exception as e:
+            # Handle exceptions
+            print(f"Failed to send email to {user.email} =>> Error: {str(e)}")
+
+
 @shared_task(name="reset_password_email_task")
 def reset_password_email_task(user_email):
     try:
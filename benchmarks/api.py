@@ -0,0 +1,307 @@
+"""
+Latency and database queries of the hot API endpoints.
+
+Seeds a dataset (seed_load_data) in a test database, the configured database
+is not touched, replays every scenario through the Django test client and
+prints the p50/p95/p99 latency and the queries per request. The results can be saved as
+a JSON baseline and compared with a later run.
+
+    python -m benchmarks.api --accounts 100 --invoices 200 --save baseline.json
+    python -m benchmarks.api --accounts 100 --invoices 200 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone  # noqa: E402
+from core.middleware import QueryRecorder  # noqa: E402
+from invoices.models import Invoice, Product  # noqa: E402
+from invoices.services.seeding import SEED_PASSWORD, LoadDataSeeder  # noqa: E402
+
+User = get_user_model()
+
+# the regressions over this ratio of the baseline fail the comparison
+DEFAULT_TOLERANCE = 0.2
+
+
+class Scenario:
+    """
+    One API call replayed for the benchmark users
+    """
+
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request
+
+
+def build_clients(users):
+    """
+    Return a test client authenticated as the user (session and JWT) by user id,
+    so the requests are measured without the login
+    """
+    clients = {}
+    for user in users:
+        client = Client(
+            raise_request_exception=False,
+            HTTP_AUTHORIZATION=f"Bearer {user.tokens()['access']}",
+        )
+        client.force_login(user)
+        clients[user.pk] = client
+    return clients
+
+
+def build_scenarios(users):
+    """
+    Return the scenarios, every request picks the next benchmark user
+    """
+    tokens = {user.pk: user.tokens()["access"] for user in users}
+    invoice_ids = {
+        account_id: invoice_id
+        for account_id, invoice_id in Invoice.objects.filter(
+            account__user__in=users
+        ).values_list("account_id", "id")
+    }
+    product_ids = {
+        account_id: product_id
+        for account_id, product_id in Product.objects.filter(
+            account__user__in=users
+        ).values_list("account_id", "id")
+    }
+    today = timezone.now().date()
+
+    def login(client, user):
+        return client.post(
+            "/api/auth/login/",
+            {"email": user.email, "password": SEED_PASSWORD},
+            content_type="application/json",
+        )
+
+    def account_detail(client, user):
+        return client.get("/api/accounts/")
+
+    def invoice_list(client, user):
+        return client.get(
+            "/api/invoices/",
+            {
+                "invoice_code": "invoice",
+                "payment_method": "10",
+                "from_date": today - timedelta(days=30),
+                "to_date": today,
+            },
+        )
+
+    def invoice_status(client, user):
+        return client.get("/api/invoices/status/")
+
+    def invoice_pdf(client, user):
+        return client.get(
+            f"/api/invoices/pdf/{invoice_ids[user.account.pk]}/",
+            {"token": tokens[user.pk]},
+        )
+
+    def invoice_create(client, user):
+        return client.post(
+            "/api/invoices/",
+            {
+                "payment_method": "10",
+                "discount_amount": "5.00",
+                "items": [{"product": product_ids[user.account.pk], "quantity": 2}],
+            },
+            content_type="application/json",
+        )
+
+    return [
+        Scenario("login", login),
+        Scenario("account_detail", account_detail),
+        Scenario("invoice_list", invoice_list),
+        Scenario("invoice_status", invoice_status),
+        Scenario("invoice_pdf", invoice_pdf),
+        Scenario("invoice_create", invoice_create),
+    ]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run_scenario(scenario, users, clients, requests, warmup):
+    """
+    Replay the scenario and return its latency (ms) and queries statistics
+    """
+    latencies, queries, errors = [], [], 0
+    for index in range(warmup + requests):
+        user = users[index % len(users)]
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            start = time.perf_counter()
+            response = scenario.request(clients[user.pk], user)
+            elapsed = time.perf_counter() - start
+        if index < warmup:
+            continue
+        if response.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed * 1000)
+        queries.append(recorder.count)
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "queries": round(statistics.median(queries), 1),
+        "max_queries": max(queries),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the changes against the baseline, return the regressed scenarios
+    """
+    regressions = []
+    print(f"\n{'scenario':<16}{'p50':>26}{'p95':>26}{'queries':>20}")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<16}{'(new)':>26}")
+            continue
+
+        columns = []
+        for key in ("p50_ms", "p95_ms", "queries"):
+            before, after = previous[key], result[key]
+            change = (after - before) / before if before else 0
+            columns.append(f"{before:g} -> {after:g} ({change:+.0%})")
+        print(f"{name:<16}{columns[0]:>26}{columns[1]:>26}{columns[2]:>20}")
+
+        if result["queries"] > previous["queries"] or (
+            previous["p95_ms"]
+            and (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] > tolerance
+        ):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--invoices", type=int, default=100, help="Invoices per account")
+    parser.add_argument("--items", type=int, default=5, help="Items per invoice")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset random seed")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests not measured")
+    parser.add_argument("--scenario", action="append", help="Only run these scenarios")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare the results with this JSON baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="p95 increase ratio tolerated by the comparison",
+    )
+    parser.add_argument(
+        "--keepdb", action="store_true", help="Keep (and reuse) the seeded test database"
+    )
+    options = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, keepdb=options.keepdb)
+    try:
+        prefix = f"load{options.seed}-"
+        if not User.objects.filter(email__startswith=prefix).exists():
+            start = time.perf_counter()
+            LoadDataSeeder(seed=options.seed, days=90).run(
+                users=options.accounts,
+                customers=2,
+                products=5,
+                invoices=options.accounts * options.invoices,
+                items=options.items,
+            )
+            print(f"Seeded the dataset in {time.perf_counter() - start:.1f}s")
+
+        users = list(
+            User.objects.filter(email__startswith=prefix)
+            .select_related("account")
+            .order_by("pk")
+        )
+        scenarios = [
+            scenario
+            for scenario in build_scenarios(users)
+            if not options.scenario or scenario.name in options.scenario
+        ]
+
+        clients = build_clients(users)
+        results = {}
+        with override_settings(
+            ACCOUNT_THROTTLE_RATES={
+                scope: "1000000/s"
+                for scope in ("invoice_create", "invoice_status", "invoice_pdf")
+            },
+        ):
+            print(f"{'scenario':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'errors':>8}")
+            for scenario in scenarios:
+                result = run_scenario(
+                    scenario, users, clients, options.requests, options.warmup
+                )
+                results[scenario.name] = result
+                print(
+                    f"{scenario.name:<16}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+                    f"{result['p99_ms']:>9}{result['queries']:>9}{result['errors']:>8}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options.keepdb)
+        teardown_test_environment()
+
+    output = {
+        "dataset": {
+            "accounts": options.accounts,
+            "invoices": options.invoices,
+            "items": options.items,
+            "seed": options.seed,
+        },
+        "environment": {
+            "database": connections["default"].vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        },
+        "created_at": timezone.now().isoformat(),
+        "results": results,
+    }
+    if options.save:
+        with open(options.save, "w") as file:
+            json.dump(output, file, indent=2)
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        if baseline["dataset"] != output["dataset"]:
+            print("\nThe baseline was measured on another dataset")
+        regressions = compare(results, baseline, options.tolerance)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Invoice write throughput of SQLite under concurrent writers.
+
+Creates invoices (invoice, item and totals in one transaction, as the invoice
+API does) from several processes on a fresh SQLite file with
+ - defaults: the SQLite defaults (rollback journal, synchronous=FULL, DEFERRED transactions)
+ - pragmas: SQLITE_PRAGMAS with DEFERRED transactions
+ - tuned: SQLITE_PRAGMAS with IMMEDIATE transactions (core.transactions.write_atomic)
+and prints the invoices per second, the p95 latency and the "database is
+locked" errors of each run.
+
+    python -m benchmarks.sqlite_writes --workers 8 --seconds 10
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connection, transaction  # noqa: E402
+from accounts.models import Account  # noqa: E402
+from invoices.models import Invoice, InvoiceItem, Product  # noqa: E402
+
+User = get_user_model()
+
+SQLITE_DEFAULTS = {"journal_mode": "delete", "synchronous": "full"}
+
+
+def use_database(path, pragmas, transaction_mode):
+    """
+    Point the default connection to the SQLite file, the next connection
+    gets the pragmas
+    """
+    connection.close()
+    connection.settings_dict["NAME"] = path
+    settings.SQLITE_PRAGMAS = pragmas
+    settings.SQLITE_TRANSACTION_MODE = transaction_mode
+
+
+def create_database(path):
+    use_database(path, SQLITE_DEFAULTS, "DEFERRED")
+    call_command("migrate", verbosity=0)
+    user = User.objects.create(email="writer@example.com", email_verified=True)
+    # the account is created by the post_save signal of the user
+    Account.objects.filter(user=user).update(
+        organization="Writer", tax_number="300000000000003"
+    )
+    account = Account.objects.get(user=user)
+    Product.objects.create(account=account, name="Product", price="10.00")
+    connection.close()
+
+
+def write_invoices(args):
+    path, pragmas, transaction_mode, seconds = args
+    use_database(path, pragmas, transaction_mode)
+    account = Account.objects.get()
+    product = Product.objects.get()
+
+    created, locked, latencies = 0, 0, []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                invoice = Invoice.objects.create(account=account, payment_method="10")
+                InvoiceItem.objects.create(invoice=invoice, product=product, quantity=2)
+                invoice.compute_invoice_data()
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        created += 1
+    connection.close()
+    return created, locked, latencies
+
+
+def run(template, directory, name, pragmas, transaction_mode, workers, seconds):
+    path = os.path.join(directory, f"{name}.sqlite3")
+    shutil.copy(template, path)
+    with Pool(workers) as pool:
+        results = pool.map(
+            write_invoices, [(path, pragmas, transaction_mode, seconds)] * workers
+        )
+
+    created = sum(result[0] for result in results)
+    locked = sum(result[1] for result in results)
+    latencies = sorted(latency for result in results for latency in result[2])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(f"{name:<10}{created / seconds:>12,.1f}{p95:>12.1f}{locked:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Writer processes")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each run")
+    options = parser.parse_args()
+
+    profiles = [
+        ("defaults", SQLITE_DEFAULTS, "DEFERRED"),
+        ("pragmas", dict(settings.SQLITE_PRAGMAS), "DEFERRED"),
+        ("tuned", dict(settings.SQLITE_PRAGMAS), "IMMEDIATE"),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, "template.sqlite3")
+        create_database(template)
+
+        print(f"{options.workers} writers, {options.seconds:g}s per run")
+        print(f"{'pragmas':<10}{'invoices/s':>12}{'p95 ms':>12}{'locked':>10}")
+        for name, pragmas, transaction_mode in profiles:
+            run(
+                template,
+                directory,
+                name,
+                pragmas,
+                transaction_mode,
+                options.workers,
+                options.seconds,
+            )
+
+
+if __name__ == "__main__":
+    main()
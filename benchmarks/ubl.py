@@ -0,0 +1,131 @@
+"""
+Throughput of the UBL invoice XML generator.
+
+Renders in-memory invoices (no database access) on one core and then on
+every core, and prints the invoices per second.
+
+    python -m benchmarks.ubl --invoices 20000 --items 5
+"""
+
+import argparse
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from multiprocessing import Pool
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from accounts.models import Account  # noqa: E402
+from invoices.models import Invoice, InvoiceCustomer, InvoiceItem  # noqa: E402
+from invoices.services.ubl import render_invoice_xml  # noqa: E402
+
+
+def build_invoices(count, items):
+    """
+    Build unsaved invoices with their items in the prefetch cache,
+    the same shape the generator gets from the submission querysets
+    """
+    account = Account(
+        id=1,
+        organization="Barq Trading Co.",
+        register_number="1010010000",
+        tax_number="300000000000003",
+        country="SA",
+        city="Riyadh",
+        street="King Fahd Road",
+        vat=Decimal("15.00"),
+    )
+    customer = InvoiceCustomer(
+        id=1,
+        organization="Customer & Sons",
+        tax_number="399999999900003",
+        city="Jeddah",
+        street="Prince Sultan Street",
+        building_number="1234",
+        postal_zone="23521",
+        district_name="Al Zahra",
+        phone="0500000000",
+    )
+    now = timezone.now()
+
+    invoices = []
+    for pk in range(1, count + 1):
+        invoice = Invoice(
+            id=pk,
+            uid=f"IN{pk:010d}",
+            invoice_type="standard" if pk % 2 else "simplified",
+            invoice_code="invoice" if pk % 10 else "credit",
+            invoice_number=pk,
+            previous_hash="NWZlY2ViNjZmZmM4NmYzOGQ5NTI3ODZjNmQ2OTZjNzljMmRiYzIzOWRkNGU5MWI0NjcyOWQ3M2EyN2ZiNTdlOQ==",
+            account=account,
+            customer_info=customer if pk % 2 else None,
+            delivery_date=(now + timedelta(days=1)).date(),
+            payment_method="10",
+            created_at=now,
+            sub_total=Decimal("100.00") * items,
+            discount_amount=Decimal("5.00"),
+            total_after_discount=Decimal("100.00") * items - Decimal("5.00"),
+            vat_amount=Decimal("15.00") * items,
+            total_after_vat=Decimal("115.00") * items - Decimal("5.00"),
+        )
+        invoice._prefetched_objects_cache = {
+            "items": [
+                InvoiceItem(
+                    invoice=invoice,
+                    name=f"Product {line} <A&B>",
+                    price=Decimal("50.00"),
+                    quantity=2,
+                    vat=Decimal("15.00"),
+                    discount=Decimal("0.00"),
+                    sub_total=Decimal("100.00"),
+                    vat_amount=Decimal("15.00"),
+                    total=Decimal("115.00"),
+                )
+                for line in range(items)
+            ]
+        }
+        invoices.append(invoice)
+    return invoices
+
+
+def render(args):
+    count, items = args
+    invoices = build_invoices(count, items)
+    start = time.perf_counter()
+    size = sum(len(render_invoice_xml(invoice)) for invoice in invoices)
+    return count, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5, help="Items per invoice")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Processes of the multi core run"
+    )
+    options = parser.parse_args()
+
+    count, elapsed, size = render((options.invoices, options.items))
+    print(
+        f"1 core: {count / elapsed:,.0f} invoices/s "
+        f"({elapsed * 1e6 / count:.1f} us/invoice, {size / count:,.0f} bytes/invoice)"
+    )
+
+    if options.workers > 1:
+        per_worker = options.invoices // options.workers
+        with Pool(options.workers) as pool:
+            results = pool.map(render, [(per_worker, options.items)] * options.workers)
+        rates = [count / elapsed for count, elapsed, _ in results]
+        print(
+            f"{options.workers} cores: {sum(rates):,.0f} invoices/s "
+            f"({sum(rates) / len(rates):,.0f} per core)"
+        )
+
+
+if __name__ == "__main__":
+    main()
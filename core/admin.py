@@ -0,0 +1,62 @@
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Page
+from .paginator import SEEK_VAR, LargeTablePaginator
+
+
+class LargeTableChangeList(ChangeList):
+    """
+    Changelist of LargeTablePaginator: the seek parameter is not a filter and
+    the links to the next and previous pages carry the seek of the current page
+    """
+
+    def get_queryset(self, request):
+        # read by the paginator (LargeTableAdminMixin.get_paginator)
+        self.params.pop(SEEK_VAR, None)
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.page = (
+            Page(self.result_list, self.page_num, self.paginator)
+            if self.multi_page and not (self.show_all and self.can_show_all)
+            else None
+        )
+
+    def get_query_string(self, new_params=None, remove=None):
+        if new_params and PAGE_VAR in new_params and self.page:
+            seek = self.paginator.seek_link(self.page, int(new_params[PAGE_VAR]))
+            new_params = {**new_params, SEEK_VAR: seek}
+        return super().get_query_string(new_params, remove)
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings of the admins over tables with millions of rows,
+    the admin sets its own list_select_related for the list_display relations
+     - no full COUNT(*) of the table on every page
+     - estimated count and keyset pagination (see LargeTablePaginator)
+     - no date_hierarchy, its drill down reads the DISTINCT dates of the whole
+       table, filter the dates with list_filter (ranges of an indexed column)
+    """
+
+    show_full_result_count = False
+    paginator = LargeTablePaginator
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
+
+    def get_paginator(
+        self, request, queryset, per_page, orphans=0, allow_empty_first_page=True
+    ):
+        return self.paginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            seek=request.GET.get(SEEK_VAR),
+        )
+
+
+class LargeTableModelAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    pass
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend starting the transactions with SQLITE_TRANSACTION_MODE
+    (DEFERRED by default) or the transaction_mode of the connection, set by
+    core.transactions.write_atomic for the transactions reading before writing.
+    A DEFERRED transaction that reads before writing can't wait for the write
+    lock and fails with "database is locked" when another process writes, an
+    IMMEDIATE transaction takes the lock first and waits for it up to the busy
+    timeout.
+    """
+
+    transaction_mode = None
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.transaction_mode or settings.SQLITE_TRANSACTION_MODE
+        self.cursor().execute(f"BEGIN {mode}")
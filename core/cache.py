@@ -0,0 +1,182 @@
+"""
+Two tier cache-aside helpers.
+
+The values are read from the per-process local memory cache (L1, the "local"
+cache) then from the shared cache (L2, the "default" cache: Redis in
+production). A missing value is computed once per key across the workers
+(single-flight): one process holds a short lock in the shared cache while the
+others wait for the value, and the shared timeouts are jittered so the keys
+cached together don't all expire at the same time.
+
+The L1 copies are only dropped by their timeout (CACHE_LOCAL_TIMEOUT), the
+other processes can serve a changed value for that long. Pass local_timeout=0
+for the values that must change everywhere as soon as they're invalidated.
+"""
+
+from contextlib import contextmanager
+import functools
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache, caches
+from .metrics import cache_lookup
+
+CACHE_LOCAL_TIMEOUT = settings.CACHE_LOCAL_TIMEOUT
+CACHE_TTL_JITTER = settings.CACHE_TTL_JITTER
+CACHE_LOCK_TIMEOUT = settings.CACHE_LOCK_TIMEOUT
+
+local_cache = caches["local"]
+
+MISSING = object()
+
+# the threads of a process computing the same key wait for each other,
+# {key: [lock, threads using it]}, the lock is dropped with its last thread
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def jittered(timeout):
+    """
+    Spread the timeout by +/- CACHE_TTL_JITTER, None (forever) stays None
+    """
+    if not timeout:
+        return timeout
+    return max(1, round(timeout * random.uniform(1 - CACHE_TTL_JITTER, 1 + CACHE_TTL_JITTER)))
+
+
+@contextmanager
+def key_lock(key):
+    """
+    Lock of the key in this process, the other keys are not blocked
+    """
+    with _key_locks_lock:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _key_locks[key]
+
+
+def local_timeout_for(timeout, local_timeout):
+    if timeout is None:
+        return local_timeout
+    return min(timeout, local_timeout)
+
+
+def get_version(name, local_timeout=CACHE_LOCAL_TIMEOUT):
+    """
+    Current version of the namespace, the keys cached with a version_key
+    include it so bump_version invalidates all of them at once
+    """
+    key = f"version:{name}"
+    version = local_cache.get(key) if local_timeout else None
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+        if local_timeout:
+            local_cache.set(key, version, local_timeout)
+    return version
+
+
+def bump_version(name):
+    """
+    Invalidate every key cached with this version_key
+    """
+    key = f"version:{name}"
+    cache.add(key, 1, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # expired between add and incr
+        cache.set(key, 1, None)
+    local_cache.delete(key)
+
+
+def get_or_set(key, compute, timeout, name=None, local_timeout=CACHE_LOCAL_TIMEOUT):
+    """
+    Return the cached value of the key, compute() sets it on a miss
+    """
+    if local_timeout:
+        value = local_cache.get(key, MISSING)
+        if value is not MISSING:
+            cache_lookup(name or key.split(":", 1)[0], True)
+            return value
+
+    value = cache.get(key, MISSING)
+    cache_lookup(name or key.split(":", 1)[0], value is not MISSING)
+    if value is MISSING:
+        with key_lock(key):
+            value = cache.get(key, MISSING)
+            if value is MISSING:
+                value = compute_once(key, compute, timeout)
+
+    if local_timeout:
+        local_cache.set(key, value, local_timeout_for(timeout, local_timeout))
+    return value
+
+
+def compute_once(key, compute, timeout):
+    """
+    Compute and cache the value, or wait for the process already computing it
+    """
+    lock_key = f"lock:{key}"
+    if cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, jittered(timeout))
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+    # the other process failed or is too slow
+    return compute()
+
+
+def cached(key_fn, timeout, version_key=None, local_timeout=CACHE_LOCAL_TIMEOUT):
+    """
+    Cache the function results with get_or_set.
+     - key_fn(*args, **kwargs) returns the cache key of the call
+     - version_key (a name or a function of the call arguments) adds the
+       version of that namespace to the key, see bump_version
+    The decorated function gets .key(*args, **kwargs) and .invalidate(*args, **kwargs)
+    """
+
+    def decorator(func):
+        def make_key(*args, **kwargs):
+            key = key_fn(*args, **kwargs)
+            if version_key is not None:
+                name = version_key(*args, **kwargs) if callable(version_key) else version_key
+                key = f"{key}:v{get_version(name, local_timeout)}"
+            return key
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_set(
+                make_key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                timeout,
+                name=func.__name__,
+                local_timeout=local_timeout,
+            )
+
+        def invalidate(*args, **kwargs):
+            key = make_key(*args, **kwargs)
+            cache.delete(key)
+            local_cache.delete(key)
+
+        wrapper.key = make_key
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
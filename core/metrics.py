@@ -0,0 +1,101 @@
+"""
+Prometheus metrics of the web and Celery processes.
+
+With several worker processes (gunicorn, Celery prefork) every process writes
+its samples to PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them, the
+directory must be set (and emptied) before the processes start.
+"""
+
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# HTTP
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by URL name",
+    ["view", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request by URL name",
+    ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_duration_seconds",
+    "Database time per request by URL name",
+    ["view"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Cache, the hit ratio is hits / (hits + misses) per cache
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Application cache lookups",
+    ["cache", "result"],
+)
+
+# Celery
+TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task runtime",
+    ["task", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Business
+INVOICES_CREATED = Counter(
+    "invoices_created_total",
+    "Invoices and offers created",
+    ["document_type", "invoice_type"],
+)
+QRCODE_IMAGES_RENDERED = Counter(
+    "qrcode_images_rendered_total",
+    "Invoice QR code images rendered",
+)
+THROTTLED_REQUESTS = Counter(
+    "account_throttled_requests_total",
+    "Requests rejected by the per-account throttles",
+    ["scope"],
+)
+
+# Signing service
+SIGN_REQUEST_LATENCY = Histogram(
+    "signing_service_request_seconds",
+    "Latency of the signing service requests",
+    ["method", "endpoint", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SIGN_CIRCUIT_OPEN = Counter(
+    "signing_service_circuit_open_total",
+    "Signing service calls rejected while the circuit breaker is open",
+)
+
+
+def cache_lookup(cache_name, hit):
+    CACHE_LOOKUPS.labels(cache=cache_name, result="hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """
+    Return the metrics exposition of all the processes (multiprocess mode)
+    or of the current process
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,204 @@
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from .metrics import REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, REQUEST_LATENCY
+from .routers import replica_aliases, use_read_replica
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def sql_signature(sql):
+    """
+    Statement shape of the SQL, the literals and the IN lists are collapsed so
+    the queries repeated with other values (N+1) share the same signature
+    """
+    sql = IN_LIST_RE.sub("(...)", sql)
+    return LITERAL_RE.sub("?", sql)
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper counting the queries and their time,
+    the statements are kept by SQL text for the profile report
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.statements = defaultdict(lambda: [0, 0])  # sql: [count, duration]
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += duration
+
+    def signatures(self):
+        """
+        [(signature, count, duration)] of the recorded queries, slowest first
+        """
+        signatures = defaultdict(lambda: [0, 0])
+        for sql, (count, duration) in self.statements.items():
+            signature = signatures[sql_signature(sql)]
+            signature[0] += count
+            signature[1] += duration
+        return sorted(
+            ((sql, count, duration) for sql, (count, duration) in signatures.items()),
+            key=lambda signature: signature[2],
+            reverse=True,
+        )
+
+
+def view_name(request):
+    """
+    Metrics label of the request, the URL name keeps the label cardinality bounded
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, database queries and database time of every request by URL name.
+    The requests over the SQL profile budgets (SQL_PROFILE_TIME_BUDGET,
+    SQL_PROFILE_QUERY_BUDGET) are logged with their most expensive and repeated
+    statements, in DEBUG every response gets the X-Query-Count and Server-Timing headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.debug = settings.DEBUG
+        self.time_budget = settings.SQL_PROFILE_TIME_BUDGET
+        self.query_budget = settings.SQL_PROFILE_QUERY_BUDGET
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = view_name(request)
+        REQUEST_LATENCY.labels(
+            view=view, method=request.method, status=response.status_code
+        ).observe(duration)
+        REQUEST_DB_QUERIES.labels(view=view).observe(recorder.count)
+        REQUEST_DB_SECONDS.labels(view=view).observe(recorder.duration)
+
+        if duration > self.time_budget or recorder.count > self.query_budget:
+            self.log_profile(request, response, view, duration, recorder)
+        if self.debug:
+            response["X-Query-Count"] = recorder.count
+            response["Server-Timing"] = (
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+                f"total;dur={duration * 1000:.1f}"
+            )
+        return response
+
+    def log_profile(self, request, response, view, duration, recorder):
+        signatures = recorder.signatures()
+        report = {
+            "view": view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 1),
+            "queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 1),
+            "duplicated": sum(count - 1 for _, count, _ in signatures if count > 1),
+            "top_sql": [
+                {"sql": sql[:1000], "count": count, "ms": round(total * 1000, 1)}
+                for sql, count, total in signatures[: settings.SQL_PROFILE_TOP_QUERIES]
+            ],
+        }
+        logger.warning("Slow request %s", json.dumps(report))
+
+
+def request_user_id(request):
+    """
+    Id of the user making the request without a database query: the session
+    user when already loaded, else the user_id claim of the JWT access token
+    (Authorization header or the token parameter of the PDF links)
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+
+    header = request.headers.get("Authorization", "")
+    raw_token = header[7:] if header.startswith("Bearer ") else request.GET.get("token")
+    if not raw_token:
+        return None
+    try:
+        return AccessToken(raw_token).get("user_id")
+    except TokenError:
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read the safe requests of the views with use_read_replica from the replicas.
+    A user is kept on the primary database for DATABASE_STICKY_SECONDS after any
+    successful write request, so the user always reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(replica_aliases())
+        self.sticky_seconds = settings.DATABASE_STICKY_SECONDS
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            token = getattr(request, "_read_replica_token", None)
+            if token is not None:
+                use_read_replica.reset(token)
+
+        if (
+            self.enabled
+            and request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+        ):
+            user_id = request_user_id(request)
+            if user_id is not None:
+                cache.set(sticky_key(user_id), True, self.sticky_seconds)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not self.enabled
+            or request.method not in ("GET", "HEAD")
+            or not getattr(getattr(view_func, "view_class", None), "use_read_replica", False)
+        ):
+            return None
+
+        user_id = request_user_id(request)
+        if user_id is not None and cache.get(sticky_key(user_id)):
+            return None
+        request._read_replica_token = use_read_replica.set(True)
+        return None
+
+
+def sticky_key(user_id):
+    return f"db_sticky:{user_id}"
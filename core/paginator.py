@@ -0,0 +1,215 @@
+import datetime
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# query string parameter of the keyset pagination ("after:[values]" or "before:[values]")
+SEEK_VAR = "seek"
+
+
+class SeekEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder keeping the microseconds of the datetimes and times,
+    the boundary must be the exact value of the row
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class LargeTablePaginator(Paginator):
+    """
+    Paginator of the admin changelists over very large tables
+     - the unfiltered count comes from the Postgres planner statistics
+       instead of a full COUNT(*)
+     - the next and previous pages are read after (or before) the ordering
+       values of the last (or first) row of the current page (keyset
+       pagination, see seek_link), their cost doesn't depend on the page depth
+     - the deep pages reached directly by number seek to the first row of the
+       page with a narrow (ordering columns only) OFFSET query and read the
+       page from there, instead of OFFSET over the full rows and their joins
+    """
+
+    # tables smaller than this are counted exactly
+    estimate_count_threshold = 100000
+    # pages starting before this offset use the default OFFSET query
+    seek_offset_threshold = 10000
+
+    def __init__(self, *args, seek=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seek = seek
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None and estimate >= self.estimate_count_threshold:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        """
+        Row estimate of the table (pg_class.reltuples), None when the queryset
+        is filtered or the database is not Postgres
+        """
+        queryset = self.object_list
+        if not hasattr(queryset, "query") or queryset.query.where:
+            return None
+
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) before the table is first analyzed
+        if not row or row[0] <= 0:
+            return None
+        return int(row[0])
+
+    def page(self, number):
+        number = self.validate_number(number)
+        ordering = self.seek_ordering()
+        if ordering is None:
+            return super().page(number)
+
+        opts = self.object_list.model._meta
+        seek = parse_seek(self.seek, [opts.get_field(field) for field, _ in ordering])
+        if seek is not None:
+            return self.seek_page(number, ordering, *seek)
+
+        bottom = (number - 1) * self.per_page
+        if bottom < self.seek_offset_threshold:
+            return super().page(number)
+
+        # first row of the page, only the ordering columns are read
+        boundary = next(
+            iter(
+                self.object_list.values_list(*[field for field, _ in ordering])[
+                    bottom : bottom + 1
+                ]
+            ),
+            None,
+        )
+        if boundary is None:
+            return Page([], number, self)
+        if None in boundary:
+            # NULL values can't be compared, read the page with OFFSET
+            return super().page(number)
+
+        page = self.object_list.filter(seek_filter(ordering, boundary))
+        return Page(page[: self.per_page], number, self)
+
+    def seek_page(self, number, ordering, direction, boundary):
+        """
+        Page of the rows strictly after (or before) the boundary row, no OFFSET
+        """
+        if direction == "after":
+            rows = self.object_list.filter(
+                seek_filter(ordering, boundary, inclusive=False)
+            )
+            return Page(rows[: self.per_page], number, self)
+
+        # the rows before the boundary are read in the reverse order, then the
+        # page is read again by primary key in the changelist order
+        reverse = [(field, not descending) for field, descending in ordering]
+        pks = list(
+            self.object_list.filter(seek_filter(reverse, boundary, inclusive=False))
+            .reverse()
+            .values_list("pk", flat=True)[: self.per_page]
+        )
+        return Page(self.object_list.filter(pk__in=pks), number, self)
+
+    def seek_link(self, page, number):
+        """
+        Seek parameter of the link from the page to the page `number`,
+        None when the target page is not next to it
+        """
+        ordering = self.seek_ordering()
+        if ordering is None or number not in (page.number - 1, page.number + 1):
+            return None
+
+        rows = list(page.object_list)
+        if not rows:
+            return None
+        row = rows[-1] if number > page.number else rows[0]
+        values = [getattr(row, field) for field, _ in ordering]
+        if None in values:
+            return None
+        direction = "after" if number > page.number else "before"
+        return f"{direction}:{json.dumps(values, cls=SeekEncoder)}"
+
+    def seek_ordering(self):
+        """
+        [(field, descending)] of the queryset ordering when it can be seeked:
+        plain columns of the model ending with the primary key
+        """
+        queryset = self.object_list
+        if not hasattr(queryset, "query") or queryset.query.distinct:
+            return None
+
+        opts = queryset.model._meta
+        ordering = []
+        for field in queryset.query.order_by:
+            if not isinstance(field, str) or "__" in field or field.lstrip("-") == "?":
+                return None
+            name = field.lstrip("-")
+            name = opts.pk.name if name == "pk" else name
+            try:
+                opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            ordering.append((name, field.startswith("-")))
+
+        if not ordering or ordering[-1][0] != opts.pk.name:
+            return None
+        return ordering
+
+
+def parse_seek(seek, fields):
+    """
+    (direction, boundary values) of the seek parameter, the values are read
+    back with the ordering fields. None when it's invalid
+    """
+    direction, _, values = (seek or "").partition(":")
+    if direction not in ("after", "before"):
+        return None
+    try:
+        values = json.loads(values)
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(fields) or None in values:
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except ValidationError:
+        return None
+    return direction, values
+
+
+def seek_filter(ordering, boundary, inclusive=True):
+    """
+    Rows after the boundary row in the ordering (and the boundary row itself when
+    inclusive), the row-value comparison (a, b) > (x, y) written as
+    a > x OR (a = x AND b > y) for mixed directions
+    """
+    condition = Q()
+    for position in range(len(ordering) - 1, -1, -1):
+        field, descending = ordering[position]
+        lookup = "lt" if descending else "gt"
+        if position == len(ordering) - 1 and inclusive:
+            lookup += "e"  # the boundary row itself
+        branch = Q(**{f"{field}__{lookup}": boundary[position]})
+        if position < len(ordering) - 1:
+            branch |= Q(**{field: boundary[position]}) & condition
+        condition = branch
+    return condition
@@ -0,0 +1,31 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+
+# set by ReplicaRoutingMiddleware while a replica safe view handles a read request
+use_read_replica = ContextVar("use_read_replica", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != "default"]
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the replica safe views (use_read_replica) to a random
+    replica, every other query and all the writes go to the primary database
+    """
+
+    def db_for_read(self, model, **hints):
+        if use_read_replica.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,146 @@
+import datetime
+import threading
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase, TestCase
+from accounts.models import Account
+from invoices.models import Invoice
+from . import cache as cache_helpers
+from .paginator import LargeTablePaginator
+
+User = get_user_model()
+
+
+class LargeTablePaginatorTests(TestCase):
+    per_page = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email="merchant@example.com")
+        account = Account.objects.get(user=user)
+        start = datetime.datetime(2024, 1, 1, 12, 0, 0, 123456)
+        # rows a microsecond apart, two by two on the same created_at
+        Invoice.objects.bulk_create(
+            Invoice(
+                account=account,
+                created_at=start + datetime.timedelta(microseconds=number // 2),
+            )
+            for number in range(23)
+        )
+
+    def queryset(self):
+        return Invoice.objects.order_by("-created_at", "-pk")
+
+    def offset_pages(self):
+        paginator = Paginator(self.queryset(), self.per_page)
+        return [
+            [invoice.pk for invoice in paginator.page(number)]
+            for number in paginator.page_range
+        ]
+
+    def test_seek_links_read_the_offset_pages(self):
+        pages = self.offset_pages()
+
+        # forward from the first page
+        paginator = LargeTablePaginator(self.queryset(), self.per_page)
+        page = paginator.page(1)
+        for number in range(2, len(pages) + 1):
+            seek = paginator.seek_link(page, number)
+            paginator = LargeTablePaginator(self.queryset(), self.per_page, seek=seek)
+            page = paginator.page(number)
+            self.assertEqual([invoice.pk for invoice in page], pages[number - 1])
+
+        # and back from the last page
+        for number in range(len(pages) - 1, 0, -1):
+            seek = paginator.seek_link(page, number)
+            paginator = LargeTablePaginator(self.queryset(), self.per_page, seek=seek)
+            page = paginator.page(number)
+            self.assertEqual([invoice.pk for invoice in page], pages[number - 1])
+
+    def test_deep_pages_read_the_offset_pages(self):
+        pages = self.offset_pages()
+        paginator = LargeTablePaginator(self.queryset(), self.per_page)
+        paginator.seek_offset_threshold = 0
+        for number, pks in enumerate(pages, 1):
+            self.assertEqual([invoice.pk for invoice in paginator.page(number)], pks)
+
+    def test_invalid_seek_reads_the_offset_page(self):
+        pages = self.offset_pages()
+        for seek in ("after:[", "after:[1]", 'before:["not a date", 1]', "sideways:[]"):
+            paginator = LargeTablePaginator(self.queryset(), self.per_page, seek=seek)
+            self.assertEqual([invoice.pk for invoice in paginator.page(2)], pages[1])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.addCleanup(cache_helpers.local_cache.clear)
+
+    def get_in_threads(self, key, compute, count):
+        values = []
+
+        def get():
+            values.append(cache_helpers.get_or_set(key, compute, 60, local_timeout=0))
+
+        threads = [threading.Thread(target=get) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return values
+
+    def test_missing_value_is_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        values = self.get_in_threads("test:once", compute, 8)
+
+        self.assertEqual(values, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_helpers._key_locks, {})
+
+    def test_waiter_gets_the_value_of_the_computing_process(self):
+        # another process holds the lock and sets the value
+        cache.add("lock:test:waiter", 1, 10)
+        timer = threading.Timer(0.2, cache.set, ["test:waiter", "shared", 60])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        value = cache_helpers.get_or_set(
+            "test:waiter", lambda: "computed", 60, local_timeout=0
+        )
+
+        self.assertEqual(value, "shared")
+
+    def test_other_keys_are_not_blocked(self):
+        computing, release = threading.Event(), threading.Event()
+
+        def compute():
+            computing.set()
+            release.wait(5)
+            return "slow"
+
+        thread = threading.Thread(
+            target=cache_helpers.get_or_set,
+            args=("test:slow", compute, 60),
+            kwargs={"local_timeout": 0},
+        )
+        thread.start()
+        computing.wait(5)
+        try:
+            value = cache_helpers.get_or_set(
+                "test:fast", lambda: "fast", 60, local_timeout=0
+            )
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(value, "fast")
+        self.assertEqual(cache.get("test:slow"), "slow")
+        self.assertEqual(cache_helpers._key_locks, {})
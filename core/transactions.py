@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+from django.db import transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    """
+    transaction.atomic() of a block reading the rows it then writes.
+    On SQLite the outermost block begins IMMEDIATE: it takes the write lock
+    first and waits for it, instead of failing with "database is locked" when
+    its read lock can't be upgraded. The other blocks stay DEFERRED so the
+    transactions only writing don't lock the database any longer.
+    """
+    connection = transaction.get_connection(using)
+    immediate = connection.vendor == "sqlite" and not connection.in_atomic_block
+    if immediate:
+        connection.transaction_mode = "IMMEDIATE"
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        if immediate:
+            connection.transaction_mode = None
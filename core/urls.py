@@ -3,6 +3,7 @@ from .views import (
     home,
     privacy_policy,
     download_ios_app,
+    metrics,
 )
 from django.contrib import admin
 from django.urls import path
@@ -21,4 +22,5 @@ urlpatterns = [
     path("", home, name="home"),
     path("download-ios/", download_ios_app, name="download_ios_app"),
     path("privacy-policy/", privacy_policy, name="privacy_policy"),
+    path("metrics", metrics, name="metrics"),
 ]
@@ -4,7 +4,10 @@ from invoices.models import Invoice
 from invoices.services.utils import create_invoice_history
 from django.shortcuts import redirect
 from django.utils import timezone
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from .metrics import render_metrics
 
 
 def home(request):
@@ -20,3 +23,20 @@ def download_ios_app(request):
     ipa_file_path = "staticfiles/ios/app.ipa"
     # Return the IPA file as a response
     return FileResponse(open(ipa_file_path, "rb"), as_attachment=True)
+
+
+def metrics(request):
+    """
+    Prometheus metrics, protected by METRICS_TOKEN (Bearer).
+    Without a token they're only served in DEBUG
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings, the metrics of all the workers are aggregated through
+PROMETHEUS_MULTIPROC_DIR (see core/metrics.py):
+
+    export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus
+    gunicorn project.wsgi -c gunicorn.conf.py
+"""
+
+import glob
+import os
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+
+
+def on_starting(server):
+    # samples of the previous run would be added to the new ones
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -6,8 +6,14 @@ from .models import (
     Product,
     InvoiceCustomer,
     InvoiceHistory,
+    SigningCredential,
 )
 from django.utils import timezone
+from core.admin import LargeTableModelAdmin
+from .services.utils import split_amount
+
+# search prefix of the (non indexed) partial match search
+FUZZY_SEARCH_PREFIX = "~"
 
 admin.site.register(InvoiceCustomer)
 
@@ -30,8 +36,16 @@ class CustomerAdmin(admin.ModelAdmin):
     readonly_fields = ["created_at"]
 
 
+@admin.register(SigningCredential)
+class SigningCredentialAdmin(admin.ModelAdmin):
+    list_display = ["account", "updated_at"]
+    search_fields = ["account__user__email"]
+    raw_id_fields = ["account"]
+    readonly_fields = ["updated_at"]
+
+
 @admin.register(InvoiceHistory)
-class InvoiceHistoryAdmin(admin.ModelAdmin):
+class InvoiceHistoryAdmin(LargeTableModelAdmin):
     list_display = [
         "uid",
         "action_type",
@@ -83,7 +97,7 @@ class InvoiceItemInline(admin.TabularInline):
         return False
 
 
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(LargeTableModelAdmin):
     list_display = (
         "uid",
         "document_type",
@@ -94,6 +108,8 @@ class InvoiceAdmin(admin.ModelAdmin):
         "status",
         "created_at",
     )
+    # account is displayed with the user email
+    list_select_related = ("account__user",)
     inlines = [InvoiceItemInline]
     readonly_fields = (
         "uid",
@@ -115,22 +131,35 @@ class InvoiceAdmin(admin.ModelAdmin):
     )
     list_filter = ("invoice_type", "invoice_code", "status", "created_at")
     search_fields = ["uid", "account__user__email"]
+    search_help_text = (
+        "Invoice uid (or its beginning) and/or the account email, "
+        f"start with {FUZZY_SEARCH_PREFIX} to search any part of them"
+    )
 
     def get_search_results(self, request, queryset, search_term):
-        # Split the search term into uid and email
-        uid, email = (
-            search_term.split(" ", 1) if " " in search_term else (search_term, "")
-        )
-        # Perform the search using Q objects
-        queryset, use_distinct = super().get_search_results(
-            request, queryset, search_term
-        )
-        if uid and email:
-            queryset |= self.model.objects.filter(
-                uid__icontains=uid, account__user__email__icontains=email
+        """
+        Indexed search, every term narrows the results
+         - a term with @ is the exact account email (unique users.email index)
+         - any other term is the uid or its beginning (uid index, the
+           varchar_pattern_ops index on Postgres serves the prefix match)
+        The default icontains search runs only when the term starts with
+        FUZZY_SEARCH_PREFIX, it scans the whole table.
+        """
+        search_term = search_term.strip()
+        if search_term.startswith(FUZZY_SEARCH_PREFIX):
+            return super().get_search_results(
+                request, queryset, search_term[len(FUZZY_SEARCH_PREFIX) :].strip()
             )
 
-        return queryset, use_distinct
+        for term in search_term.split():
+            if "@" in term:
+                queryset = queryset.filter(
+                    account__user__email__in={term, term.lower()}
+                )
+            else:
+                queryset = queryset.filter(uid__startswith=term)
+
+        return queryset, False
 
     # def has_delete_permission(self, request, obj=None):
     #     # This prevents users from deleting invoices as well
@@ -143,11 +172,12 @@ class InvoiceAdmin(admin.ModelAdmin):
             invoice.compute_invoice_data()
             discount_amount = invoice.discount_amount
             if discount_amount > 0:
-                invoice_items = invoice.items.all()
-                item_discount = discount_amount / invoice_items.count()
-                for item in invoice_items:
-                    item.discount = item_discount
-                    item.save()
+                invoice_items = list(invoice.items.order_by("pk"))
+                if invoice_items:
+                    discounts = split_amount(discount_amount, len(invoice_items))
+                    for item, discount in zip(invoice_items, discounts):
+                        item.discount = discount
+                    InvoiceItem.objects.bulk_update(invoice_items, ["discount"])
 
     # def save_model(self, request, obj, form, change):
     #     # Calculate the discount amount and set it for each InvoiceItem
@@ -209,4 +239,12 @@ class InvoiceAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Invoice, InvoiceAdmin)
-admin.site.register(InvoiceItem)
+
+
+@admin.register(InvoiceItem)
+class InvoiceItemAdmin(LargeTableModelAdmin):
+    list_display = ["invoice", "name", "quantity", "total"]
+    list_select_related = ["invoice"]
+    search_fields = ["invoice__uid"]
+    # the select widgets would load every invoice and product
+    raw_id_fields = ["invoice", "product"]
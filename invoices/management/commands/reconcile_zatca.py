@@ -0,0 +1,87 @@
+import datetime
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from invoices.services.reconcile import (
+    ZATCA_RECONCILE_CHUNK_SIZE,
+    InvoiceReconciler,
+    day_range,
+)
+from invoices.services.sign_client import ZatcaServiceError
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the passed and error invoices of a date range with the signing "
+        "service records and fix the drifting statuses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from",
+            dest="start",
+            help="First day to reconcile, YYYY-MM-DD (default: yesterday)",
+        )
+        parser.add_argument(
+            "--to",
+            dest="end",
+            help="Last day to reconcile (included), YYYY-MM-DD (default: --from)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ZATCA_RECONCILE_CHUNK_SIZE,
+            help="Number of invoices compared per signing service lookup",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the differences, do not update the invoices",
+        )
+        parser.add_argument(
+            "--report",
+            help="Write the discrepancy report to this CSV file (default: stdout)",
+        )
+
+    def handle(self, *args, **options):
+        start = (
+            parse_date(options["start"])
+            if options["start"]
+            else timezone.now().date() - datetime.timedelta(days=1)
+        )
+        end = parse_date(options["end"]) if options["end"] else start
+        if end < start:
+            raise CommandError("--to must not be before --from")
+
+        report = (
+            open(options["report"], "w", newline="", encoding="utf-8")
+            if options["report"]
+            else sys.stdout
+        )
+        reconciler = InvoiceReconciler(
+            report=report,
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+        )
+        try:
+            summary = reconciler.run(*day_range(start, end))
+        except ZatcaServiceError as e:
+            raise CommandError(e)
+        finally:
+            if report is not sys.stdout:
+                report.close()
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Checked {summary['checked']} invoices: {summary['drifted']} drifted "
+                f"({summary['updated']} updated), {summary['missing']} missing from ZATCA"
+            )
+        )
+
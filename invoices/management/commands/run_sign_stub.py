@@ -0,0 +1,119 @@
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import uuid
+from django.core.management.base import BaseCommand
+from invoices.services.constants import INVOICE_STATUS
+
+
+class SignStubHandler(BaseHTTPRequestHandler):
+    """
+    Answer every invoice submission with the configured ZATCA status,
+    the results are kept in memory for the status lookups and an invoice
+    sent again with the same idempotency key gets its first result
+    """
+
+    status = "passed"
+    delay = 0
+    counter = count(1)
+    lock = threading.Lock()
+    records = {}
+    idempotent = {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.rstrip("/").endswith("invoices/status"):
+            return self.send_json(404, {"detail": "Not found"})
+
+        ids = parse_qs(url.query).get("ids", [""])[0]
+        results = [
+            # invoices submitted before the stub started get the configured status
+            self.records.get(invoice_id, {"id": invoice_id, "status": self.status})
+            for invoice_id in (int(i) for i in ids.split(",") if i)
+        ]
+        self.send_json(200, {"results": results})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self.send_json(400, {"detail": "Invalid JSON body"})
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if self.path.rstrip("/").endswith("report"):
+            results = [self.result(invoice) for invoice in payload.get("invoices", [])]
+            return self.send_json(200, {"results": results})
+
+        self.send_json(200, self.result(payload))
+
+    def result(self, invoice):
+        key = invoice.get("idempotency_key")
+        with self.lock:
+            if key in self.idempotent:
+                return self.idempotent[key]
+            invoice_number = invoice.get("invoice_number") or next(self.counter)
+
+        # locally signed invoices come with their hash
+        invoice_hash = invoice.get("invoice_hash") or base64.b64encode(
+            hashlib.sha256(json.dumps(invoice).encode("utf-8")).digest()
+        ).decode("utf-8")
+        result = {
+            "id": invoice.get("id"),
+            "status": self.status,
+            "invoice_pk": str(uuid.uuid4()),
+            "invoice_number": invoice_number,
+            "invoice_hash": invoice_hash,
+            "note": "Stub warning" if self.status == "passed_with_warnings" else None,
+        }
+        self.records[result["id"]] = result
+        if key:
+            self.idempotent[key] = result
+        return result
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = "Run a local stub of the signing service (SIGN_INV_SVC_URL) for tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument(
+            "--status",
+            default="passed",
+            choices=[status for status, _ in INVOICE_STATUS if status != "standby"],
+            help="ZATCA status returned for every invoice",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0,
+            help="Seconds to wait before answering, to simulate ZATCA latency",
+        )
+
+    def handle(self, *args, **options):
+        SignStubHandler.status = options["status"]
+        SignStubHandler.delay = options["delay"]
+        server = ThreadingHTTPServer((options["host"], options["port"]), SignStubHandler)
+        self.stdout.write(
+            f"Signing service stub listening on http://{options['host']}:{options['port']}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,84 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from invoices.services.seeding import SEED_CHUNK_SIZE, LoadDataSeeder, User, seed_email
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic users, accounts, payments, customers, products and "
+        "invoices (items and history) for load tests and profiling"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Users with their account")
+        parser.add_argument(
+            "--customers", type=int, default=5, help="Customers per account"
+        )
+        parser.add_argument("--products", type=int, default=20, help="Products per account")
+        parser.add_argument("--invoices", type=int, default=100000, help="Invoices in total")
+        parser.add_argument(
+            "--items", type=int, default=5, help="Maximum items per invoice"
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Days the invoices are spread over"
+        )
+        parser.add_argument(
+            "--until",
+            help="Last day of the invoices, YYYY-MM-DD (default: today)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed, the same seed gives the same data"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=SEED_CHUNK_SIZE,
+            help="Number of rows inserted per batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes computing the invoices (default: CPU count)",
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options["until"]:
+            try:
+                until = datetime.date.fromisoformat(options["until"])
+            except ValueError:
+                raise CommandError(
+                    f"Invalid date '{options['until']}', expected YYYY-MM-DD"
+                )
+        if User.objects.filter(email=seed_email(options["seed"], 0)).exists():
+            raise CommandError(
+                f"The data of seed {options['seed']} already exists, use another --seed"
+            )
+
+        start = time.perf_counter()
+        seeder = LoadDataSeeder(
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            until=until,
+            days=options["days"],
+            log=lambda message: self.stderr.write(
+                f"[{time.perf_counter() - start:7.1f}s] {message}"
+            ),
+        )
+        created = seeder.run(
+            users=options["users"],
+            customers=options["customers"],
+            products=options["products"],
+            invoices=options["invoices"],
+            items=options["items"],
+        )
+
+        summary = ", ".join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {summary} in {time.perf_counter() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0009_alter_invoicehistory_action_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoicehistory',
+            name='action_type',
+            field=models.CharField(choices=[('change_invoice_code', 'Change Invoice Code'), ('change_document_type', 'Change Document Type'), ('reject_invoice', 'Reject Invoice'), ('share_invoice', 'Share Invoice')], default='change_invoice_code', max_length=255),
+        ),
+    ]
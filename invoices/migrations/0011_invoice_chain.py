@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_account_logo_variants'),
+        ('invoices', '0010_alter_invoicehistory_action_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='invoice_hash',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='previous_hash',
+            field=models.CharField(blank=True, help_text='Previous invoice hash (PIH)', max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.PositiveBigIntegerField(help_text='Invoice counter value (ICV) of the account chain', null=True),
+        ),
+        migrations.CreateModel(
+            name='InvoiceChain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_counter', models.PositiveBigIntegerField(default=0)),
+                ('last_hash', models.CharField(default='NWZlY2ViNjZmZmM4NmYzOGQ5NTI3ODZjNmQ2OTZjNzljMmRiYzIzOWRkNGU5MWI0NjcyOWQ3M2EyN2ZiNTdlOQ==', max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_chain', to='accounts.account')),
+            ],
+        ),
+    ]
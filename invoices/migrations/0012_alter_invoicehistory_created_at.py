@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-19 18:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0011_invoice_chain'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoicehistory',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-19 19:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_paymenthistory_created_at'),
+        ('invoices', '0012_alter_invoicehistory_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SigningCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('private_key', models.TextField(help_text='PEM encoded EC private key')),
+                ('certificate', models.TextField(help_text='PEM certificate or the CSID binary security token (base64 DER)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signing_credential', to='accounts.account')),
+            ],
+        ),
+    ]
@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 import uuid
-from django.db.models import Sum
+from django.db.models import Exists, OuterRef, Subquery, Sum
 from django.contrib.auth import get_user_model
 from accounts.models import Account
 from django.core.exceptions import ValidationError
@@ -9,6 +9,7 @@ from accounts.models import NumericLengthValidator
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from .services.qrcode import generate_qrcode
+from core.metrics import INVOICES_CREATED
 import datetime
 from .services.constants import (
     DOCUMENT_TYPES,
@@ -18,6 +19,7 @@ from .services.constants import (
     DISCOUNT_TYPES,
     INVOICE_STATUS,
     HISTORY_ACTION_TYPE,
+    INITIAL_INVOICE_HASH,
 )
 
 User = get_user_model()
@@ -146,9 +148,17 @@ class Invoice(models.Model):
     invoice_code = models.CharField(
         max_length=255, choices=INVOICE_CODE, default="invoice", db_index=True
     )
-    invoice_number = models.PositiveBigIntegerField(null=True)
+    invoice_number = models.PositiveBigIntegerField(
+        null=True, help_text="Invoice counter value (ICV) of the account chain"
+    )
     invoice_pk = models.CharField(max_length=255, null=True)
 
+    # ZATCA phase 2 hash chain, filled when the invoice is shared with zatca
+    previous_hash = models.CharField(
+        max_length=255, null=True, blank=True, help_text="Previous invoice hash (PIH)"
+    )
+    invoice_hash = models.CharField(max_length=255, null=True, blank=True)
+
     account = models.ForeignKey(
         Account, on_delete=models.CASCADE, related_name="invoices", db_index=True
     )
@@ -275,7 +285,52 @@ class Invoice(models.Model):
 
             self.uid = generate_invoice_uid(self.account, self.document_type)
 
-        return super().save(*args, **kwargs)
+        adding = self._state.adding
+        result = super().save(*args, **kwargs)
+        if adding:
+            counter = INVOICES_CREATED.labels(
+                document_type=self.document_type, invoice_type=self.invoice_type
+            )
+            transaction.on_commit(counter.inc)
+        return result
+
+
+class InvoiceChain(models.Model):
+    """
+    Head of the account invoice chain (ZATCA phase 2): the last invoice counter
+    value and the hash of the last invoice. The submissions of an account hold
+    it in turn (services.chain.hold_account_chain).
+    """
+
+    account = models.OneToOneField(
+        Account, on_delete=models.CASCADE, related_name="invoice_chain"
+    )
+    last_counter = models.PositiveBigIntegerField(default=0)
+    last_hash = models.CharField(max_length=255, default=INITIAL_INVOICE_HASH)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.account} #{self.last_counter}"
+
+
+class SigningCredential(models.Model):
+    """
+    ECDSA private key and certificate (CSID) of the account ZATCA configuration,
+    used to sign the invoices in process (ZATCA_LOCAL_SIGNING).
+    updated_at is the date of the last configuration change.
+    """
+
+    account = models.OneToOneField(
+        Account, on_delete=models.CASCADE, related_name="signing_credential"
+    )
+    private_key = models.TextField(help_text="PEM encoded EC private key")
+    certificate = models.TextField(
+        help_text="PEM certificate or the CSID binary security token (base64 DER)"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.account)
 
 
 class InvoiceItem(models.Model):
@@ -347,36 +402,56 @@ class InvoiceHistory(models.Model):
     created_date = models.DateTimeField()
     shared_date = models.DateTimeField(null=True)
 
-    created_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     @staticmethod
     def can_share_credit_invoice(invoice):
         """
         Check if the credit invoice can be shared with Zatca
          - invoice status is passed or passed_with_warnings
-         - invoice date is after last otp update
+         - invoice date is after the last ZATCA configuration change
+           (the account signing credential)
         """
-        related_invoice = (
-            InvoiceHistory.objects.select_related(
-                "invoice", "invoice__account", "invoice__account__zatca_account"
+        invoice_id = getattr(invoice, "pk", invoice)
+        return InvoiceHistory.can_share_credit_invoices([invoice_id]).get(
+            invoice_id, False
+        )
+
+    @staticmethod
+    def can_share_credit_invoices(invoices):
+        """
+        Set based can_share_credit_invoice, check a queryset or a list of invoice ids
+        with one query and return {invoice id: can be shared}
+        """
+        shared_history = InvoiceHistory.objects.filter(
+            invoice=OuterRef("pk"),
+            action_type="change_invoice_code",
+            status__in=["passed", "passed_with_warnings"],
+        ).order_by("created_at")
+        rows = (
+            Invoice.objects.filter(pk__in=invoices)
+            .annotate(
+                is_shared=Exists(shared_history),
+                shared_date=Subquery(shared_history.values("shared_date")[:1]),
             )
-            .filter(
-                invoice=invoice,
-                action_type="change_invoice_code",
-                status__in=["passed", "passed_with_warnings"],
+            .values_list(
+                "pk",
+                "is_shared",
+                "shared_date",
+                "account__signing_credential__updated_at",
             )
-            .order_by("created_at")
-            .first()
+            .order_by()
         )
-        if related_invoice:
-            last_updated = related_invoice.invoice.account.zatca_account.updated_at
-            is_after_last_config = (
-                related_invoice.shared_date > last_updated if last_updated else True
-            )
-
-            return is_after_last_config
 
-        return False
+        eligibility = {}
+        for invoice_id, is_shared, shared_date, last_updated in rows:
+            if not is_shared:
+                eligibility[invoice_id] = False
+            elif last_updated:
+                eligibility[invoice_id] = bool(shared_date and shared_date > last_updated)
+            else:
+                eligibility[invoice_id] = True
+        return eligibility
 
     class Meta:
         ordering = ["-created_at"]
@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from invoices.models import Invoice, InvoiceChain
+from .constants import PASSED_INVOICE_STATUS
+from .sign_client import ZatcaResultUnknownError, ZatcaServiceError
+
+ZATCA_CHAIN_LOCK_TIMEOUT = settings.ZATCA_CHAIN_LOCK_TIMEOUT
+
+# Delete the lock only while it holds the token of its owner
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ChainBusyError(ZatcaServiceError):
+    """
+    Another worker kept the account chain for ZATCA_CHAIN_LOCK_TIMEOUT,
+    the submission can be retried
+    """
+
+
+class ChainConflictError(ZatcaResultUnknownError):
+    """
+    Another worker moved the account chain head while this one held it (the
+    chain lock expired), the results are not saved and the submission is retried
+    """
+
+
+class AccountChain:
+    """
+    Head of the account invoice chain.
+    Must be used through hold_account_chain(): the submissions of one account
+    are serialized by a cache lock while their invoices are out for signing,
+    so the database is only written in the short transaction saving the results.
+    save() checks the head under a row lock in case the cache lock didn't hold.
+    """
+
+    def __init__(self, account_id):
+        # Accounts created before the chain existed continue their last invoice number
+        self.state, _ = InvoiceChain.objects.get_or_create(
+            account_id=account_id,
+            defaults={
+                "last_counter": lambda: Invoice.objects.filter(
+                    account_id=account_id
+                ).aggregate(last=Max("invoice_number"))["last"]
+                or 0
+            },
+        )
+        self.read = (self.state.last_counter, self.state.last_hash)
+        self.next_counter = self.state.last_counter + 1
+
+    def assign(self, invoice: Invoice):
+        """
+        Assign the next invoice counter value to the invoice
+        """
+        invoice.invoice_number = self.next_counter
+        invoice.previous_hash = None
+        invoice.invoice_hash = None
+        self.next_counter += 1
+
+    @property
+    def previous_hash(self):
+        return self.state.last_hash
+
+    def advance(self, invoices):
+        """
+        Move the chain head over the sent invoices, in the order they were
+        chained (and signed) from the head. The invoices up to the last one
+        ZATCA accepted stay in the chain with the counter and previous hash
+        they were sent with, the rejected ones included: the invoices after
+        them were chained on their hash. The next invoices, and the invoices
+        after one without hash, are left out of the chain.
+        """
+        kept = 0
+        for index, invoice in enumerate(invoices):
+            if not invoice.invoice_hash:
+                break
+            if invoice.status in PASSED_INVOICE_STATUS:
+                kept = index + 1
+
+        for invoice in invoices[:kept]:
+            invoice.previous_hash = self.state.last_hash
+            self.state.last_counter = invoice.invoice_number
+            self.state.last_hash = invoice.invoice_hash
+        for invoice in invoices[kept:]:
+            self.drop(invoice)
+
+    @staticmethod
+    def drop(invoice: Invoice):
+        """
+        Leave the invoice out of the chain, it gets a new counter when it's
+        submitted again
+        """
+        invoice.invoice_number = None
+        invoice.previous_hash = None
+        invoice.invoice_hash = None
+
+    def save(self):
+        """
+        Save the chain head, in the transaction saving the results (write_atomic).
+        Raise ChainConflictError when another submission moved it since it was read.
+        """
+        current = (
+            InvoiceChain.objects.select_for_update()
+            .values_list("last_counter", "last_hash")
+            .get(pk=self.state.pk)
+        )
+        if current != self.read:
+            raise ChainConflictError(
+                f"The invoice chain of account {self.state.account_id} was moved "
+                f"by another submission ({self.read[0]} -> {current[0]})"
+            )
+        self.state.save(update_fields=["last_counter", "last_hash", "updated_at"])
+        self.read = (self.state.last_counter, self.state.last_hash)
+
+
+def release_chain_lock(key, token):
+    """
+    Release the chain lock if it's still held with the token, it may have
+    expired and been taken by another submission
+    """
+    backend = getattr(cache, "_cache", None)
+    if hasattr(backend, "get_client"):
+        backend.get_client(write=True).eval(
+            RELEASE_LOCK_SCRIPT, 1, cache.make_key(key), token
+        )
+    elif cache.get(key) == token:
+        # not atomic, the local memory cache is only shared by the threads of a process
+        cache.delete(key)
+
+
+@contextmanager
+def hold_account_chain(account_id):
+    """
+    Hold the account invoice chain (ICV and PIH) for one submission and yield it,
+    wait up to ZATCA_CHAIN_LOCK_TIMEOUT for the submission holding it.
+    Save the results and the chain in a write_atomic() block inside the block.
+    """
+    key = f"zatca:chain:{account_id}"
+    # an int is stored as is by the Redis cache, the release script compares it
+    token = uuid.uuid4().int >> 65
+    deadline = time.monotonic() + ZATCA_CHAIN_LOCK_TIMEOUT
+    while not cache.add(key, token, ZATCA_CHAIN_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise ChainBusyError(f"The invoice chain of account {account_id} is busy")
+        time.sleep(0.1)
+
+    try:
+        yield AccountChain(account_id)
+    finally:
+        release_chain_lock(key, token)
@@ -36,6 +36,7 @@ HISTORY_ACTION_TYPE = (
     ("change_invoice_code", "Change Invoice Code"),
     ("change_document_type", "Change Document Type"),
     ("reject_invoice", "Reject Invoice"),
+    ("share_invoice", "Share Invoice"),
 )
 
 CUSTOMER_INFO_REQUIRED = [
@@ -48,3 +49,14 @@ CUSTOMER_ZATCA_INFO_REQUIRED = [
     "postal_zone",
     "district_name",
 ]
+
+# invoice statuses picked up by the ZATCA submission pipeline
+SUBMITTABLE_INVOICE_STATUS = ["standby", "rejected", "error"]
+PASSED_INVOICE_STATUS = ["passed", "passed_with_warnings"]
+# invoice statuses compared with the signing service records by the reconciliation
+RECONCILED_INVOICE_STATUS = ["passed", "passed_with_warnings", "error"]
+
+# ZATCA phase 2 previous invoice hash (PIH) of the first invoice: base64(sha256("0"))
+INITIAL_INVOICE_HASH = (
+    "NWZlY2ViNjZmZmM4NmYzOGQ5NTI3ODZjNmQ2OTZjNzljMmRiYzIzOWRkNGU5MWI0NjcyOWQ3M2EyN2ZiNTdlOQ=="
+)
@@ -1,6 +1,7 @@
-from base64 import b64encode
+from base64 import b64decode, b64encode
 import qrcode
 import io
+from core.metrics import QRCODE_IMAGES_RENDERED
 
 
 # def generate_qrcode(organization, tax_number, timestamp, invoice_total, tax_amount):
@@ -63,6 +64,37 @@ def generate_qrcode(invoice):
     return encoded_data
 
 
+def tlv(tag, value):
+    """
+    Encode one TLV field of the ZATCA QR code
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return bytes([tag, len(value)]) + value
+
+
+def generate_signed_qrcode(
+    invoice, invoice_hash, signature, public_key, certificate_signature=None
+):
+    """
+    Phase 2 QR code, the phase 1 tags followed by
+     - 6: invoice hash
+     - 7: ECDSA signature of the invoice hash
+     - 8: ECDSA public key (DER)
+     - 9: signature of the certificate by the ZATCA CA (simplified invoices only)
+    """
+    tlv_data = [
+        b64decode(generate_qrcode(invoice)),
+        tlv(6, invoice_hash),
+        tlv(7, signature),
+        tlv(8, public_key),
+    ]
+    if certificate_signature:
+        tlv_data.append(tlv(9, certificate_signature))
+
+    return b64encode(b"".join(tlv_data)).decode("utf-8")
+
+
 def create_qrcode_image(qrcode_str, output_file="qrcode.png"):
     # Create QR code instance
     qr = qrcode.QRCode(
@@ -76,6 +108,7 @@ def create_qrcode_image(qrcode_str, output_file="qrcode.png"):
 
     # Generate QR code image
     qr_image = qr.make_image(fill_color="black", back_color="white")
+    QRCODE_IMAGES_RENDERED.inc()
 
     # Save the QR code image to an in-memory buffer
     buffer = io.BytesIO()
@@ -0,0 +1,126 @@
+import csv
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from invoices.models import Invoice
+from .constants import INVOICE_STATUS, PASSED_INVOICE_STATUS, RECONCILED_INVOICE_STATUS
+from .sign_client import ZatcaServiceError, get_sign_client
+
+ZATCA_RECONCILE_CHUNK_SIZE = settings.ZATCA_RECONCILE_CHUNK_SIZE
+
+# invoice fields compared with the signing service records
+RECONCILED_FIELDS = ["status", "invoice_pk", "invoice_hash"]
+REPORT_HEADER = ["invoice", "uid", "field", "local", "zatca"]
+
+
+def day_range(first_day, last_day):
+    """
+    [start, end) datetimes covering the days, the range stays on the created_at index
+    """
+    start = datetime.datetime.combine(first_day, datetime.time.min)
+    end = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time.min)
+    if settings.USE_TZ:
+        return timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def fetch_zatca_records(invoice_ids):
+    """
+    Return the signing service records of the invoices by invoice id,
+    invoices unknown to the service are missing from the result
+    """
+    response = get_sign_client().get(
+        "invoices/status/", params={"ids": ",".join(map(str, invoice_ids))}
+    )
+    if response.status_code >= 400:
+        raise ZatcaServiceError(
+            f"Signing service lookup failed {response.status_code}: {response.text[:500]}"
+        )
+    return {record["id"]: record for record in response.json()["results"]}
+
+
+class InvoiceReconciler:
+    """
+    Compare the shared invoices of a date range with the signing service records.
+    The invoices are streamed and checked in chunks, the drifting invoices are
+    fixed with one bulk_update per chunk and every difference is written to the
+    report as one (invoice, uid, field, local, zatca) row.
+    """
+
+    def __init__(self, report=None, chunk_size=ZATCA_RECONCILE_CHUNK_SIZE, dry_run=False):
+        self.writer = csv.writer(report) if report is not None else None
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.summary = {"checked": 0, "drifted": 0, "missing": 0, "updated": 0}
+
+    def run(self, start, end):
+        if self.writer:
+            self.writer.writerow(REPORT_HEADER)
+
+        invoices = (
+            Invoice.objects.filter(
+                status__in=RECONCILED_INVOICE_STATUS,
+                created_at__gte=start,
+                created_at__lt=end,
+            )
+            .only("id", "uid", "note", "shared_at", *RECONCILED_FIELDS)
+            .order_by("pk")
+        )
+
+        chunk = []
+        for invoice in invoices.iterator(chunk_size=self.chunk_size):
+            chunk.append(invoice)
+            if len(chunk) == self.chunk_size:
+                self.reconcile_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.reconcile_chunk(chunk)
+
+        return self.summary
+
+    def reconcile_chunk(self, invoices):
+        records = fetch_zatca_records([invoice.pk for invoice in invoices])
+
+        drifted = []
+        for invoice in invoices:
+            record = records.get(invoice.pk)
+            if record is None:
+                self.summary["missing"] += 1
+                self.report(invoice, "record", "present", "missing")
+            elif self.apply_record(invoice, record):
+                drifted.append(invoice)
+
+        self.summary["checked"] += len(invoices)
+        self.summary["drifted"] += len(drifted)
+        if drifted and not self.dry_run:
+            Invoice.objects.bulk_update(
+                drifted, [*RECONCILED_FIELDS, "note", "shared_at"]
+            )
+            self.summary["updated"] += len(drifted)
+
+    def apply_record(self, invoice: Invoice, record):
+        """
+        Copy the signing service values on the invoice, True when it drifted
+        """
+        drifted = False
+        for field in RECONCILED_FIELDS:
+            local, remote = getattr(invoice, field), record.get(field)
+            if remote is None or local == remote:
+                continue
+
+            self.report(invoice, field, local, remote)
+            if field == "status" and remote not in dict(INVOICE_STATUS):
+                # unknown service status, only reported
+                continue
+            setattr(invoice, field, remote)
+            drifted = True
+
+        if drifted:
+            invoice.note = record.get("note", invoice.note)
+            if invoice.status in PASSED_INVOICE_STATUS and not invoice.shared_at:
+                invoice.shared_at = timezone.now()
+        return drifted
+
+    def report(self, invoice: Invoice, field, local, remote):
+        if self.writer:
+            self.writer.writerow([invoice.pk, invoice.uid, field, local, remote])
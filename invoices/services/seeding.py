@@ -0,0 +1,402 @@
+"""
+Synthetic load data (seed_load_data) for profiling on realistic volumes.
+
+All the rows are inserted with bulk_create in chunks, so the post_save signals
+(accounts.services.signals) are not sent: the accounts are created with their
+users and the profile_completed flag is set directly. The invoice amounts,
+items and phase 1 QR codes are computed in worker processes, every chunk has
+its own random generator so the data only depends on the seed and not on the
+order the workers finish.
+"""
+
+import datetime
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Account, Package, PaymentHistory
+from invoices.models import (
+    Customer,
+    Invoice,
+    InvoiceCustomer,
+    InvoiceHistory,
+    InvoiceItem,
+    Product,
+)
+from .constants import PAYMENT_METHODS
+from .qrcode import generate_qrcode
+
+User = get_user_model()
+
+SEED_PASSWORD = "Load-Data-1"
+SEED_CHUNK_SIZE = 5000
+CENT = Decimal("0.01")
+
+# (status, weight) of the generated invoices
+INVOICE_STATUS_WEIGHTS = [
+    ("passed", 70),
+    ("passed_with_warnings", 10),
+    ("standby", 15),
+    ("rejected", 3),
+    ("error", 2),
+]
+CREDIT_INVOICE_RATIO = 0.05
+
+
+def seed_email(seed, index):
+    return f"load{seed}-{index}@example.com"
+
+
+def chunk_random(seed, name, index=0):
+    """
+    Random generator of one chunk, only depends on the seed and the chunk
+    """
+    return random.Random(f"{seed}:{name}:{index}")
+
+
+# Accounts, products and customers of the run, set in every worker process
+_worker_accounts = None
+
+
+def _init_worker(accounts):
+    global _worker_accounts
+    django.setup()
+    _worker_accounts = accounts
+
+
+def build_invoices(args):
+    """
+    Compute the invoices of one chunk (worker process), return plain rows:
+    (invoice fields, [item fields], history fields or None)
+    """
+    seed, chunk, count, items, start, days = args
+    rng = chunk_random(seed, "invoices", chunk)
+    statuses, weights = zip(*INVOICE_STATUS_WEIGHTS)
+    payment_methods = [method for method, _ in PAYMENT_METHODS]
+
+    rows = []
+    for number in range(count):
+        account, products, customers = rng.choice(_worker_accounts)
+        created_at = start - datetime.timedelta(seconds=rng.randrange(days * 86400))
+        customer = rng.choice(customers) if customers and rng.random() < 0.3 else None
+
+        lines = []
+        for product_id, name, price in rng.sample(
+            products, rng.randint(1, min(items, len(products)))
+        ):
+            quantity = rng.randint(1, 10)
+            sub_total = price * quantity
+            vat_amount = (sub_total * account.vat / 100).quantize(CENT)
+            lines.append(
+                {
+                    "product_id": product_id,
+                    "name": name,
+                    "price": price,
+                    "quantity": quantity,
+                    "vat": account.vat,
+                    "discount": Decimal("0.00"),
+                    "sub_total": sub_total,
+                    "vat_amount": vat_amount,
+                    "total": sub_total + vat_amount,
+                }
+            )
+
+        credit = rng.random() < CREDIT_INVOICE_RATIO
+        # the credit invoices were changed from an invoice, the app swaps the uid
+        # prefix. The number is fixed width (chunks up to a million invoices) so
+        # the uids of two chunks never collide
+        uid = f"IN{created_at:%y%m%d}{chunk:04d}{number:06d}"
+        invoice = Invoice(
+            account=account,
+            customer_id=customer[0] if customer else None,
+            customer_info_id=customer[1] if customer else None,
+            invoice_type="standard" if customer and customer[2] else "simplified",
+            invoice_code="credit" if credit else "invoice",
+            uid=uid.replace("IN", "RE", 1) if credit else uid,
+            payment_method=rng.choice(payment_methods),
+            status=rng.choices(statuses, weights)[0],
+            created_at=created_at,
+            delivery_date=created_at.date(),
+            sub_total=sum(line["sub_total"] for line in lines),
+            discount_amount=Decimal("0.00"),
+        )
+        invoice.total_after_discount = invoice.sub_total
+        invoice.vat_amount = sum(line["vat_amount"] for line in lines)
+        invoice.total_after_vat = invoice.total_after_discount + invoice.vat_amount
+        invoice.qrcode = generate_qrcode(invoice)
+        if invoice.status in ("passed", "passed_with_warnings"):
+            invoice.shared_at = created_at + datetime.timedelta(minutes=rng.randint(1, 60))
+
+        history = None
+        if credit:
+            history = {
+                "action_type": "change_invoice_code",
+                "uid": uid,
+                "invoice_code": "invoice",
+                "qrcode": invoice.qrcode,
+                "status": invoice.status,
+                "created_date": created_at,
+                "shared_date": invoice.shared_at,
+                "created_at": created_at + datetime.timedelta(days=rng.randint(1, 5)),
+            }
+
+        fields = {
+            field.attname: getattr(invoice, field.attname)
+            for field in Invoice._meta.concrete_fields
+            if not field.primary_key
+        }
+        rows.append((fields, lines, history))
+    return rows
+
+
+class LoadDataSeeder:
+    """
+    Create users with their accounts, payments, customers, products and
+    invoices (items and history rows) at the scale of millions of rows
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        chunk_size=SEED_CHUNK_SIZE,
+        workers=None,
+        until=None,
+        days=365,
+        log=None,
+    ):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.days = days
+        until = until or timezone.now().date()
+        self.start = datetime.datetime.combine(
+            until + datetime.timedelta(days=1), datetime.time.min
+        )
+        if settings.USE_TZ:
+            self.start = timezone.make_aware(self.start)
+        self.log = log or (lambda message: None)
+        self.created = {}
+
+    def run(self, users, customers, products, invoices, items):
+        """
+        Seed the data and return the number of rows created by model
+        """
+        accounts = self.create_accounts(users)
+        self.create_payments(accounts)
+        catalog = self.create_catalog(accounts, customers, products)
+        self.create_invoices(catalog, invoices, items)
+        return self.created
+
+    def add_created(self, model, count):
+        self.created[model.__name__] = self.created.get(model.__name__, 0) + count
+
+    def bulk_create(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.chunk_size)
+        self.add_created(model, len(created))
+        return created
+
+    def chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield start // self.chunk_size, range(start, min(start + self.chunk_size, total))
+
+    def create_accounts(self, total):
+        password = make_password(SEED_PASSWORD)
+        accounts = []
+        for chunk, indexes in self.chunks(total):
+            rng = chunk_random(self.seed, "accounts", chunk)
+            with transaction.atomic():
+                users = self.bulk_create(
+                    User,
+                    [
+                        User(
+                            email=seed_email(self.seed, index),
+                            password=password,
+                            email_verified=True,
+                            profile_completed=True,
+                            date_joined=self.start
+                            - datetime.timedelta(days=self.days + rng.randint(0, 365)),
+                        )
+                        for index in indexes
+                    ],
+                )
+                accounts += self.bulk_create(
+                    Account,
+                    [
+                        Account(
+                            user=user,
+                            organization=f"Load Trading {index}",
+                            register_number=f"{1010000000 + index}",
+                            tax_number=f"3{index:013d}3",
+                            city=rng.choice(["Riyadh", "Jeddah", "Dammam", "Mecca"]),
+                            street="King Fahd Road",
+                            phone=f"05{rng.randrange(10 ** 8):08d}",
+                            taxable=True,
+                        )
+                        for index, user in zip(indexes, users)
+                    ],
+                )
+            self.log(f"{len(accounts)} accounts")
+        return accounts
+
+    def create_payments(self, accounts):
+        package = Package.objects.order_by("pk").first()
+        for chunk in range(0, len(accounts), self.chunk_size):
+            rng = chunk_random(self.seed, "payments", chunk)
+            payments = []
+            for account in accounts[chunk : chunk + self.chunk_size]:
+                created_at = account.user.date_joined
+                for _ in range(rng.randint(1, 3)):
+                    duration = rng.choice([1, 3, 6, 12])
+                    payments.append(
+                        PaymentHistory(
+                            user=account.user,
+                            package=package,
+                            amount=Decimal(duration * 100),
+                            duration=duration,
+                            status="completed",
+                            created_at=created_at,
+                            completed_at=created_at,
+                            expiration_date=created_at
+                            + datetime.timedelta(days=duration * 30),
+                            package_name=package.name if package else "Load",
+                            package_price=package.price if package else Decimal("100"),
+                        )
+                    )
+                    created_at += datetime.timedelta(days=duration * 30)
+            self.bulk_create(PaymentHistory, payments)
+
+    def create_catalog(self, accounts, customers, products):
+        """
+        Create the customers (with their invoice snapshot) and the products,
+        return [(account, [(product id, name, price)], [(customer id, info id, standard)])]
+        """
+        catalog = []
+        for chunk in range(0, len(accounts), self.chunk_size):
+            rng = chunk_random(self.seed, "catalog", chunk)
+            account_chunk = accounts[chunk : chunk + self.chunk_size]
+
+            customer_rows = []
+            for account in account_chunk:
+                for index in range(customers):
+                    fields = {
+                        "organization": f"Customer {account.pk}-{index}",
+                        "tax_number": f"3{rng.randrange(10 ** 13):013d}3"
+                        if rng.random() < 0.5
+                        else None,
+                        "city": "Riyadh",
+                        "street": "Olaya Street",
+                        "phone": f"05{rng.randrange(10 ** 8):08d}",
+                        "building_number": f"{rng.randint(1000, 9999)}",
+                        "postal_zone": f"{rng.randint(10000, 99999)}",
+                        "district_name": "Al Olaya",
+                    }
+                    customer_rows.append((account, fields))
+
+            with transaction.atomic():
+                customer_list = self.bulk_create(
+                    Customer,
+                    [Customer(account=account, **fields) for account, fields in customer_rows],
+                )
+                infos = self.bulk_create(
+                    InvoiceCustomer,
+                    [InvoiceCustomer(**fields) for _, fields in customer_rows],
+                )
+                product_list = self.bulk_create(
+                    Product,
+                    [
+                        Product(
+                            account=account,
+                            name=f"Product {index}",
+                            price=Decimal(rng.randint(100, 500000)) / 100,
+                        )
+                        for account in account_chunk
+                        for index in range(products)
+                    ],
+                )
+
+            by_account = {account.pk: (account, [], []) for account in account_chunk}
+            for product in product_list:
+                by_account[product.account_id][1].append(
+                    (product.pk, product.name, product.price)
+                )
+            for customer, info in zip(customer_list, infos):
+                by_account[customer.account_id][2].append(
+                    (customer.pk, info.pk, bool(customer.tax_number))
+                )
+            catalog += by_account.values()
+        return catalog
+
+    def create_invoices(self, catalog, total, items):
+        """
+        Insert the invoices computed by the worker processes, chunk by chunk.
+        At most two chunks per worker are in flight, so the computed rows
+        waiting for their insert don't pile up in memory.
+        """
+        # the processes only need the fields used by the amounts and the QR code
+        accounts = [
+            (
+                Account(
+                    pk=account.pk,
+                    organization=account.organization,
+                    tax_number=account.tax_number,
+                    vat=account.vat,
+                ),
+                products,
+                customers,
+            )
+            for account, products, customers in catalog
+            if products
+        ]
+        if not accounts:
+            return
+
+        tasks = (
+            (self.seed, chunk, len(indexes), items, self.start, self.days)
+            for chunk, indexes in self.chunks(total)
+        )
+        workers = self.workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(accounts,)
+        ) as executor:
+            created = 0
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(build_invoices, task))
+                if len(pending) >= 2 * workers:
+                    created += self.insert_invoices(pending.popleft().result())
+                    self.log(f"{created} invoices")
+            while pending:
+                created += self.insert_invoices(pending.popleft().result())
+                self.log(f"{created} invoices")
+
+    def insert_invoices(self, rows):
+        with transaction.atomic():
+            invoices = self.bulk_create(
+                Invoice, [Invoice(**fields) for fields, _, _ in rows]
+            )
+            self.bulk_create(
+                InvoiceItem,
+                [
+                    InvoiceItem(invoice=invoice, **line)
+                    for invoice, (_, lines, _) in zip(invoices, rows)
+                    for line in lines
+                ],
+            )
+            self.bulk_create(
+                InvoiceHistory,
+                [
+                    InvoiceHistory(invoice=invoice, **history)
+                    for invoice, (_, _, history) in zip(invoices, rows)
+                    if history
+                ],
+            )
+        return len(invoices)
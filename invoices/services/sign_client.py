@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from django.conf import settings
+from core.metrics import SIGN_CIRCUIT_OPEN, SIGN_REQUEST_LATENCY
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+
+class ZatcaServiceError(Exception):
+    """
+    The signing service is unreachable or failed, the submission can be retried
+    """
+
+
+class ZatcaResultUnknownError(ZatcaServiceError):
+    """
+    The POST may have been processed by the signing service (read timeout,
+    dropped connection or server error), its records must be checked before
+    sending it again
+    """
+
+
+class CircuitOpenError(ZatcaServiceError):
+    """
+    The signing service is considered down, the call failed fast
+    """
+
+
+class CircuitBreaker:
+    """
+    Open the circuit after `failure_threshold` consecutive failures and fail fast
+    for `reset_timeout` seconds, then let one trial call through (half open)
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or (
+                self.trial_running
+            ):
+                SIGN_CIRCUIT_OPEN.inc()
+                raise CircuitOpenError("Signing service circuit breaker is open")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def connection_failed(error):
+    """
+    True when the request failed before reaching the service (connect error)
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class SigningServiceClient:
+    """
+    HTTP client of the signing service (SIGN_INV_SVC_URL).
+    Connections are kept alive in a pool, every call has connect and read
+    timeouts, only the idempotent calls are retried, and a circuit breaker
+    fails fast while the service is down.
+    """
+
+    def __init__(self):
+        self.base_url = settings.SIGN_INV_SVC_URL.rstrip("/")
+        self.timeout = (
+            settings.SIGN_INV_SVC_CONNECT_TIMEOUT,
+            settings.SIGN_INV_SVC_READ_TIMEOUT,
+        )
+        self.breaker = CircuitBreaker(
+            settings.SIGN_INV_SVC_BREAKER_THRESHOLD,
+            settings.SIGN_INV_SVC_BREAKER_RESET,
+        )
+
+        retry = Retry(
+            total=settings.SIGN_INV_SVC_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # idempotent methods only
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.SIGN_INV_SVC_POOL_SIZE,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, endpoint, **kwargs):
+        """
+        Call the signing service, raise ZatcaServiceError when the call fails
+        or the service answers with a server error. A POST that may have reached
+        the service raises ZatcaResultUnknownError, only the connect failures
+        can be sent again blindly.
+        """
+        self.breaker.before_call()
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}/{endpoint.lstrip('/')}",
+                timeout=self.timeout,
+                **kwargs,
+            )
+            outcome = str(response.status_code)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            if method == "POST" and not connection_failed(e):
+                raise ZatcaResultUnknownError(str(e)) from e
+            raise ZatcaServiceError(str(e)) from e
+        finally:
+            SIGN_REQUEST_LATENCY.labels(
+                method=method, endpoint=endpoint, outcome=outcome
+            ).observe(time.perf_counter() - start)
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            error = ZatcaResultUnknownError if method == "POST" else ZatcaServiceError
+            raise error(
+                f"Signing service error {response.status_code}: {response.text[:500]}"
+            )
+
+        self.breaker.record_success()
+        return response
+
+    def get(self, endpoint, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_sign_client():
+    """
+    Return the process wide signing service client.
+    A new client is created after a fork so the worker processes never share sockets.
+    """
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = SigningServiceClient()
+            _client_pid = os.getpid()
+        return _client
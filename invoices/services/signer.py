@@ -0,0 +1,201 @@
+"""
+In process ZATCA invoice signing (ZATCA_LOCAL_SIGNING).
+
+The invoice hash is the SHA-256 of the canonical UBL XML rendered without the
+signed sections, it is signed with the account ECDSA key and the signature,
+certificate and phase 2 QR code are embedded back in the document.
+"""
+
+from base64 import b64decode, b64encode
+import hashlib
+import threading
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from invoices.models import Invoice, SigningCredential
+from .qrcode import generate_signed_qrcode
+from .ubl import render_invoice_xml, text
+
+ZATCA_LOCAL_SIGNING = settings.ZATCA_LOCAL_SIGNING
+
+SHA256_URI = "http://www.w3.org/2001/04/xmlenc#sha256"
+
+SIGNED_PROPERTIES = (
+    '<xades:SignedProperties Id="xadesSignedProperties">'
+    "<xades:SignedSignatureProperties>"
+    "<xades:SigningTime>{signing_time}</xades:SigningTime>"
+    "<xades:SigningCertificate><xades:Cert><xades:CertDigest>"
+    f'<ds:DigestMethod Algorithm="{SHA256_URI}"></ds:DigestMethod>'
+    "<ds:DigestValue>{certificate_hash}</ds:DigestValue>"
+    "</xades:CertDigest><xades:IssuerSerial>"
+    "<ds:X509IssuerName>{issuer}</ds:X509IssuerName>"
+    "<ds:X509SerialNumber>{serial_number}</ds:X509SerialNumber>"
+    "</xades:IssuerSerial></xades:Cert></xades:SigningCertificate>"
+    "</xades:SignedSignatureProperties>"
+    "</xades:SignedProperties>"
+)
+EXTENSIONS = (
+    "<ext:UBLExtensions><ext:UBLExtension>"
+    "<ext:ExtensionURI>urn:oasis:names:specification:ubl:dsig:enveloped:xades</ext:ExtensionURI>"
+    "<ext:ExtensionContent>"
+    '<sig:UBLDocumentSignatures xmlns:sac="urn:oasis:names:specification:ubl:schema:xsd:SignatureAggregateComponents-2"'
+    ' xmlns:sbc="urn:oasis:names:specification:ubl:schema:xsd:SignatureBasicComponents-2"'
+    ' xmlns:sig="urn:oasis:names:specification:ubl:schema:xsd:CommonSignatureComponents-2">'
+    "<sac:SignatureInformation>"
+    "<cbc:ID>urn:oasis:names:specification:ubl:signature:1</cbc:ID>"
+    "<sbc:ReferencedSignatureID>urn:oasis:names:specification:ubl:signature:Invoice</sbc:ReferencedSignatureID>"
+    '<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#" Id="signature">'
+    "<ds:SignedInfo>"
+    '<ds:CanonicalizationMethod Algorithm="http://www.w3.org/2006/12/xml-c14n11"></ds:CanonicalizationMethod>'
+    '<ds:SignatureMethod Algorithm="http://www.w3.org/2001/04/xmldsig-more#ecdsa-sha256"></ds:SignatureMethod>'
+    '<ds:Reference Id="invoiceSignedData" URI="">'
+    "<ds:Transforms>"
+    '<ds:Transform Algorithm="http://www.w3.org/TR/1999/REC-xpath-19991116">'
+    "<ds:XPath>not(//ancestor-or-self::ext:UBLExtensions)</ds:XPath></ds:Transform>"
+    '<ds:Transform Algorithm="http://www.w3.org/TR/1999/REC-xpath-19991116">'
+    "<ds:XPath>not(//ancestor-or-self::cac:Signature)</ds:XPath></ds:Transform>"
+    '<ds:Transform Algorithm="http://www.w3.org/TR/1999/REC-xpath-19991116">'
+    "<ds:XPath>not(//ancestor-or-self::cac:AdditionalDocumentReference[cbc:ID='QR'])</ds:XPath></ds:Transform>"
+    '<ds:Transform Algorithm="http://www.w3.org/2006/12/xml-c14n11"></ds:Transform>'
+    "</ds:Transforms>"
+    f'<ds:DigestMethod Algorithm="{SHA256_URI}"></ds:DigestMethod>'
+    "<ds:DigestValue>{invoice_hash}</ds:DigestValue>"
+    "</ds:Reference>"
+    '<ds:Reference Type="http://www.w3.org/2000/09/xmldsig#SignatureProperties" URI="#xadesSignedProperties">'
+    f'<ds:DigestMethod Algorithm="{SHA256_URI}"></ds:DigestMethod>'
+    "<ds:DigestValue>{signed_properties_hash}</ds:DigestValue>"
+    "</ds:Reference>"
+    "</ds:SignedInfo>"
+    "<ds:SignatureValue>{signature}</ds:SignatureValue>"
+    "<ds:KeyInfo><ds:X509Data><ds:X509Certificate>{certificate}</ds:X509Certificate></ds:X509Data></ds:KeyInfo>"
+    "<ds:Object>"
+    '<xades:QualifyingProperties xmlns:xades="http://uri.etsi.org/01903/v1.3.2#" Target="signature">'
+    "{signed_properties}"
+    "</xades:QualifyingProperties>"
+    "</ds:Object>"
+    "</ds:Signature>"
+    "</sac:SignatureInformation>"
+    "</sig:UBLDocumentSignatures>"
+    "</ext:ExtensionContent>"
+    "</ext:UBLExtension></ext:UBLExtensions>"
+)
+QRCODE = (
+    "<cac:AdditionalDocumentReference><cbc:ID>QR</cbc:ID><cac:Attachment>"
+    '<cbc:EmbeddedDocumentBinaryObject mimeCode="text/plain">{qrcode}</cbc:EmbeddedDocumentBinaryObject>'
+    "</cac:Attachment></cac:AdditionalDocumentReference>"
+)
+SIGNATURE = (
+    "<cac:Signature>"
+    "<cbc:ID>urn:oasis:names:specification:ubl:signature:Invoice</cbc:ID>"
+    "<cbc:SignatureMethod>urn:oasis:names:specification:ubl:dsig:enveloped:xades</cbc:SignatureMethod>"
+    "</cac:Signature>"
+)
+
+
+def b64_sha256(value: bytes):
+    return b64encode(hashlib.sha256(value).digest()).decode("utf-8")
+
+
+class SigningKey:
+    """
+    Parsed ECDSA private key and certificate (CSID) of an account
+    """
+
+    def __init__(self, private_key, certificate):
+        self.private_key = serialization.load_pem_private_key(
+            private_key.encode("utf-8"), password=None
+        )
+        if certificate.startswith("-----BEGIN"):
+            self.certificate = x509.load_pem_x509_certificate(
+                certificate.encode("utf-8")
+            )
+        else:
+            # CSID binary security token, the base64 DER of the certificate
+            self.certificate = x509.load_der_x509_certificate(b64decode(certificate))
+
+        der = self.certificate.public_bytes(serialization.Encoding.DER)
+        self.certificate_body = b64encode(der).decode("utf-8")
+        # ZATCA digests the base64 certificate and encodes the hex digest
+        self.certificate_hash = b64encode(
+            hashlib.sha256(self.certificate_body.encode("utf-8")).hexdigest().encode()
+        ).decode("utf-8")
+        self.issuer = self.certificate.issuer.rfc4514_string()
+        self.serial_number = self.certificate.serial_number
+        self.public_key = self.certificate.public_key().public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        self.certificate_signature = self.certificate.signature
+
+    def sign(self, digest: bytes):
+        return self.private_key.sign(digest, ec.ECDSA(hashes.SHA256()))
+
+
+_keys = {}
+_keys_lock = threading.Lock()
+
+
+def get_signing_key(credential: SigningCredential):
+    """
+    Return the parsed signing key of the account credential.
+    The keys are parsed once per process and reloaded when the credential
+    changes (credential.updated_at).
+    """
+    cached = _keys.get(credential.pk)
+    if cached and cached[0] == credential.updated_at:
+        return cached[1]
+
+    key = SigningKey(credential.private_key, credential.certificate)
+    with _keys_lock:
+        _keys[credential.pk] = (credential.updated_at, key)
+    return key
+
+
+def sign_invoice(invoice: Invoice):
+    """
+    Sign the invoice with its account key and return the signed XML.
+    The invoice_number and previous_hash must already be set, the invoice_hash
+    and the phase 2 qrcode are set on the invoice (without saving it).
+    """
+    try:
+        credential = invoice.account.signing_credential
+    except SigningCredential.DoesNotExist:
+        raise ImproperlyConfigured(
+            f"Account {invoice.account_id} has no signing credential for ZATCA_LOCAL_SIGNING"
+        )
+    key = get_signing_key(credential)
+
+    digest = hashlib.sha256(render_invoice_xml(invoice)).digest()
+    invoice.invoice_hash = b64encode(digest).decode("utf-8")
+    signature = b64encode(key.sign(digest)).decode("utf-8")
+    invoice.qrcode = generate_signed_qrcode(
+        invoice,
+        invoice.invoice_hash,
+        signature,
+        key.public_key,
+        key.certificate_signature if invoice.invoice_type == "simplified" else None,
+    )
+
+    signed_properties = SIGNED_PROPERTIES.format(
+        signing_time=timezone.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        certificate_hash=text(key.certificate_hash),
+        issuer=text(key.issuer),
+        serial_number=key.serial_number,
+    )
+    return render_invoice_xml(
+        invoice,
+        {
+            "extensions": EXTENSIONS.format(
+                invoice_hash=invoice.invoice_hash,
+                signed_properties_hash=b64_sha256(signed_properties.encode("utf-8")),
+                signature=signature,
+                certificate=key.certificate_body,
+                signed_properties=signed_properties,
+            ),
+            "qrcode": QRCODE.format(qrcode=text(invoice.qrcode)),
+            "signature": SIGNATURE,
+        },
+    )
@@ -0,0 +1,13 @@
+from accounts.services.throttling import AccountRateThrottle
+
+
+class InvoiceCreateThrottle(AccountRateThrottle):
+    scope = "invoice_create"
+
+
+class InvoiceStatusThrottle(AccountRateThrottle):
+    scope = "invoice_status"
+
+
+class InvoicePdfThrottle(AccountRateThrottle):
+    scope = "invoice_pdf"
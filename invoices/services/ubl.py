@@ -0,0 +1,282 @@
+"""
+UBL 2.1 invoice / credit note XML for ZATCA.
+
+The documents are written incrementally from precompiled fragments instead
+of building a DOM. The output is already in canonical form (C14N: no XML
+declaration, no whitespace between elements, expanded empty elements,
+namespace declarations first and escaped text), so the document rendered
+without the signed sections is the invoice hash input.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+import uuid
+from invoices.models import Invoice
+
+CURRENCY = "SAR"
+CENT = Decimal("0.01")
+UUID_NAMESPACE = uuid.UUID("6f1b6c1e-8d3a-4c52-9a52-3f0c1e7b9a10")
+
+INVOICE_TYPE_CODES = {"invoice": "388", "credit": "381", "debit": "383"}
+# KSA-2 invoice transaction code: standard (0100000) or simplified (0200000)
+INVOICE_TRANSACTION_CODES = {"standard": "0100000", "simplified": "0200000"}
+
+# C14N text and attribute escaping
+_TEXT_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#xD;"})
+_ATTR_ESCAPE = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        '"': "&quot;",
+        "\t": "&#x9;",
+        "\n": "&#xA;",
+        "\r": "&#xD;",
+    }
+)
+
+HEADER = (
+    '<Invoice xmlns="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"'
+    ' xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2"'
+    ' xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2"'
+    ' xmlns:ext="urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2">'
+)
+FOOTER = "</Invoice>"
+
+DOCUMENT = (
+    "<cbc:ProfileID>reporting:1.0</cbc:ProfileID>"
+    "<cbc:ID>{uid}</cbc:ID>"
+    "<cbc:UUID>{uuid}</cbc:UUID>"
+    "<cbc:IssueDate>{issue_date}</cbc:IssueDate>"
+    "<cbc:IssueTime>{issue_time}</cbc:IssueTime>"
+    '<cbc:InvoiceTypeCode name="{transaction_code}">{type_code}</cbc:InvoiceTypeCode>'
+    "<cbc:DocumentCurrencyCode>SAR</cbc:DocumentCurrencyCode>"
+    "<cbc:TaxCurrencyCode>SAR</cbc:TaxCurrencyCode>"
+)
+BILLING_REFERENCE = (
+    "<cac:BillingReference><cac:InvoiceDocumentReference>"
+    "<cbc:ID>{reference}</cbc:ID>"
+    "</cac:InvoiceDocumentReference></cac:BillingReference>"
+)
+CHAIN_REFERENCES = (
+    "<cac:AdditionalDocumentReference><cbc:ID>ICV</cbc:ID>"
+    "<cbc:UUID>{counter}</cbc:UUID></cac:AdditionalDocumentReference>"
+    "<cac:AdditionalDocumentReference><cbc:ID>PIH</cbc:ID><cac:Attachment>"
+    '<cbc:EmbeddedDocumentBinaryObject mimeCode="text/plain">{previous_hash}'
+    "</cbc:EmbeddedDocumentBinaryObject></cac:Attachment>"
+    "</cac:AdditionalDocumentReference>"
+)
+ADDRESS = (
+    "<cac:PostalAddress>"
+    "<cbc:StreetName>{street}</cbc:StreetName>"
+    "<cbc:BuildingNumber>{building_number}</cbc:BuildingNumber>"
+    "<cbc:CitySubdivisionName>{district_name}</cbc:CitySubdivisionName>"
+    "<cbc:CityName>{city}</cbc:CityName>"
+    "<cbc:PostalZone>{postal_zone}</cbc:PostalZone>"
+    "<cac:Country><cbc:IdentificationCode>{country}</cbc:IdentificationCode></cac:Country>"
+    "</cac:PostalAddress>"
+)
+PARTY_TAX_SCHEME = (
+    "<cac:PartyTaxScheme><cbc:CompanyID>{tax_number}</cbc:CompanyID>"
+    "<cac:TaxScheme><cbc:ID>VAT</cbc:ID></cac:TaxScheme></cac:PartyTaxScheme>"
+)
+SUPPLIER = (
+    "<cac:AccountingSupplierParty><cac:Party>"
+    '<cac:PartyIdentification><cbc:ID schemeID="CRN">{register_number}</cbc:ID>'
+    "</cac:PartyIdentification>"
+    "{address}{tax_scheme}"
+    "<cac:PartyLegalEntity><cbc:RegistrationName>{organization}</cbc:RegistrationName>"
+    "</cac:PartyLegalEntity>"
+    "</cac:Party></cac:AccountingSupplierParty>"
+)
+CUSTOMER = (
+    "<cac:AccountingCustomerParty><cac:Party>"
+    "{address}{tax_scheme}"
+    "<cac:PartyLegalEntity><cbc:RegistrationName>{organization}</cbc:RegistrationName>"
+    "</cac:PartyLegalEntity>"
+    "</cac:Party></cac:AccountingCustomerParty>"
+)
+EMPTY_CUSTOMER = "<cac:AccountingCustomerParty></cac:AccountingCustomerParty>"
+DELIVERY = (
+    "<cac:Delivery><cbc:ActualDeliveryDate>{delivery_date}</cbc:ActualDeliveryDate>"
+    "</cac:Delivery>"
+)
+PAYMENT_MEANS = (
+    "<cac:PaymentMeans><cbc:PaymentMeansCode>{payment_method}</cbc:PaymentMeansCode>"
+    "{instruction_note}</cac:PaymentMeans>"
+)
+INSTRUCTION_NOTE = "<cbc:InstructionNote>{note}</cbc:InstructionNote>"
+TAX_CATEGORY = (
+    "<cbc:ID>{category}</cbc:ID><cbc:Percent>{percent}</cbc:Percent>"
+    "{exemption}<cac:TaxScheme><cbc:ID>VAT</cbc:ID></cac:TaxScheme>"
+)
+TAX_EXEMPTION = (
+    "<cbc:TaxExemptionReasonCode>VATEX-SA-OOS</cbc:TaxExemptionReasonCode>"
+    "<cbc:TaxExemptionReason>Not subject to VAT</cbc:TaxExemptionReason>"
+)
+ALLOWANCE = (
+    "<cac:AllowanceCharge><cbc:ChargeIndicator>false</cbc:ChargeIndicator>"
+    "<cbc:AllowanceChargeReason>discount</cbc:AllowanceChargeReason>"
+    '<cbc:Amount currencyID="SAR">{amount}</cbc:Amount>'
+    "<cac:TaxCategory>{tax_category}</cac:TaxCategory>"
+    "</cac:AllowanceCharge>"
+)
+TOTALS = (
+    '<cac:TaxTotal><cbc:TaxAmount currencyID="SAR">{vat_amount}</cbc:TaxAmount></cac:TaxTotal>'
+    '<cac:TaxTotal><cbc:TaxAmount currencyID="SAR">{vat_amount}</cbc:TaxAmount>'
+    "<cac:TaxSubtotal>"
+    '<cbc:TaxableAmount currencyID="SAR">{total_after_discount}</cbc:TaxableAmount>'
+    '<cbc:TaxAmount currencyID="SAR">{vat_amount}</cbc:TaxAmount>'
+    "<cac:TaxCategory>{tax_category}</cac:TaxCategory>"
+    "</cac:TaxSubtotal></cac:TaxTotal>"
+    "<cac:LegalMonetaryTotal>"
+    '<cbc:LineExtensionAmount currencyID="SAR">{sub_total}</cbc:LineExtensionAmount>'
+    '<cbc:TaxExclusiveAmount currencyID="SAR">{total_after_discount}</cbc:TaxExclusiveAmount>'
+    '<cbc:TaxInclusiveAmount currencyID="SAR">{total_after_vat}</cbc:TaxInclusiveAmount>'
+    '<cbc:AllowanceTotalAmount currencyID="SAR">{discount_amount}</cbc:AllowanceTotalAmount>'
+    '<cbc:PayableAmount currencyID="SAR">{total_after_vat}</cbc:PayableAmount>'
+    "</cac:LegalMonetaryTotal>"
+)
+LINE = (
+    "<cac:InvoiceLine><cbc:ID>{line}</cbc:ID>"
+    '<cbc:InvoicedQuantity unitCode="PCE">{quantity}</cbc:InvoicedQuantity>'
+    '<cbc:LineExtensionAmount currencyID="SAR">{sub_total}</cbc:LineExtensionAmount>'
+    '<cac:TaxTotal><cbc:TaxAmount currencyID="SAR">{vat_amount}</cbc:TaxAmount>'
+    '<cbc:RoundingAmount currencyID="SAR">{total}</cbc:RoundingAmount></cac:TaxTotal>'
+    "<cac:Item><cbc:Name>{name}</cbc:Name>"
+    "<cac:ClassifiedTaxCategory>{tax_category}</cac:ClassifiedTaxCategory></cac:Item>"
+    '<cac:Price><cbc:PriceAmount currencyID="SAR">{price}</cbc:PriceAmount></cac:Price>'
+    "</cac:InvoiceLine>"
+)
+
+
+def text(value):
+    return "" if value is None else str(value).translate(_TEXT_ESCAPE)
+
+
+def attr(value):
+    return "" if value is None else str(value).translate(_ATTR_ESCAPE)
+
+
+def amount(value):
+    return str(Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def invoice_uuid(invoice: Invoice):
+    """
+    Stable UUID of the invoice document, the uid changes with the invoice code
+    """
+    return uuid.uuid5(UUID_NAMESPACE, f"{invoice.account_id}:{invoice.pk}:{invoice.uid}")
+
+
+def tax_category(vat):
+    vat = Decimal(vat or 0)
+    if vat > 0:
+        return TAX_CATEGORY.format(category="S", percent=amount(vat), exemption="")
+    return TAX_CATEGORY.format(category="O", percent="0.00", exemption=TAX_EXEMPTION)
+
+
+def address(party, country="SA"):
+    return ADDRESS.format(
+        street=text(party.street),
+        building_number=text(getattr(party, "building_number", None)),
+        district_name=text(getattr(party, "district_name", None)),
+        city=text(party.city),
+        postal_zone=text(getattr(party, "postal_zone", None)),
+        country=text(country),
+    )
+
+
+def iter_invoice_xml(invoice: Invoice, signed_sections=None):
+    """
+    Yield the canonical UBL XML of the invoice chunk by chunk.
+    The invoice must have its `items` prefetched and `account` / `customer_info` loaded.
+
+    signed_sections is an optional dict of the already rendered
+    "extensions", "qrcode" and "signature" sections added by the signer,
+    without them the output is the invoice hash input.
+    """
+    signed_sections = signed_sections or {}
+    account = invoice.account
+    customer = invoice.customer_info
+    category = tax_category(account.vat)
+
+    yield HEADER
+    yield signed_sections.get("extensions", "")
+    yield DOCUMENT.format(
+        uid=text(invoice.uid),
+        uuid=invoice_uuid(invoice),
+        issue_date=invoice.created_at.strftime("%Y-%m-%d"),
+        issue_time=invoice.created_at.strftime("%H:%M:%S"),
+        transaction_code=attr(INVOICE_TRANSACTION_CODES[invoice.invoice_type]),
+        type_code=INVOICE_TYPE_CODES[invoice.invoice_code],
+    )
+    if invoice.invoice_code != "invoice":
+        # the credit uid is the original invoice uid with the RE prefix
+        yield BILLING_REFERENCE.format(reference=text(invoice.uid.replace("RE", "IN", 1)))
+    yield CHAIN_REFERENCES.format(
+        counter=text(invoice.invoice_number), previous_hash=text(invoice.previous_hash)
+    )
+    yield signed_sections.get("qrcode", "")
+    yield signed_sections.get("signature", "")
+
+    yield SUPPLIER.format(
+        register_number=text(account.register_number),
+        address=address(account, account.country or "SA"),
+        tax_scheme=PARTY_TAX_SCHEME.format(tax_number=text(account.tax_number)),
+        organization=text(account.organization),
+    )
+    if customer:
+        yield CUSTOMER.format(
+            address=address(customer),
+            tax_scheme=(
+                PARTY_TAX_SCHEME.format(tax_number=text(customer.tax_number))
+                if customer.tax_number
+                else ""
+            ),
+            organization=text(customer.organization),
+        )
+    else:
+        yield EMPTY_CUSTOMER
+
+    if invoice.invoice_type == "standard":
+        yield DELIVERY.format(delivery_date=invoice.delivery_date.strftime("%Y-%m-%d"))
+    yield PAYMENT_MEANS.format(
+        payment_method=text(invoice.payment_method),
+        instruction_note=(
+            INSTRUCTION_NOTE.format(note="Refund")
+            if invoice.invoice_code != "invoice"
+            else ""
+        ),
+    )
+    if invoice.discount_amount:
+        yield ALLOWANCE.format(
+            amount=amount(invoice.discount_amount), tax_category=category
+        )
+    yield TOTALS.format(
+        vat_amount=amount(invoice.vat_amount),
+        total_after_discount=amount(invoice.total_after_discount),
+        tax_category=category,
+        sub_total=amount(invoice.sub_total),
+        total_after_vat=amount(invoice.total_after_vat),
+        discount_amount=amount(invoice.discount_amount),
+    )
+
+    for line, item in enumerate(invoice.items.all(), start=1):
+        yield LINE.format(
+            line=line,
+            quantity=item.quantity,
+            sub_total=amount(item.sub_total),
+            vat_amount=amount(item.vat_amount),
+            total=amount(item.total),
+            name=text(item.name),
+            tax_category=tax_category(item.vat),
+            price=amount(item.price),
+        )
+
+    yield FOOTER
+
+
+def render_invoice_xml(invoice: Invoice, signed_sections=None):
+    """
+    Return the canonical UBL XML of the invoice as UTF-8 bytes
+    """
+    return "".join(iter_invoice_xml(invoice, signed_sections)).encode("utf-8")
@@ -1,3 +1,4 @@
+from decimal import Decimal, ROUND_DOWN
 from invoices.models import Invoice, InvoiceHistory
 from django.utils import timezone
 
@@ -30,13 +31,22 @@ def create_invoice_history(invoice: Invoice, action_type="change_invoice_code"):
     create an InvoiceHistory record for specific actions:
     - When the invoice code is changed from 'invoice' to 'credit'
     - When the invoice is rejected or error occurs
+    - When the invoice is shared with Zatca
 
     params:
-      - action_type: 'change_invoice_code' or 'reject_invoice'
+      - action_type: 'change_invoice_code', 'reject_invoice' or 'share_invoice'
     """
 
     # Create a history record for this invoice
-    InvoiceHistory.objects.create(
+    build_invoice_history(invoice, action_type).save()
+
+
+def build_invoice_history(invoice: Invoice, action_type="change_invoice_code"):
+    """
+    Build an unsaved InvoiceHistory record from the current invoice data,
+    used to insert the history of many invoices with bulk_create
+    """
+    return InvoiceHistory(
         invoice=invoice,
         uid=invoice.uid,
         invoice_code=invoice.invoice_code,
@@ -47,3 +57,15 @@ def create_invoice_history(invoice: Invoice, action_type="change_invoice_code"):
         action_type=action_type,
         note=invoice.note,
     )
+
+
+def split_amount(amount, parts):
+    """
+    Split the amount into `parts` shares rounded to the cent that add up exactly
+    to the amount, the remaining cents go to the first shares
+    """
+    cent = Decimal("0.01")
+    amount = Decimal(amount).quantize(cent)
+    share = (amount / parts).quantize(cent, rounding=ROUND_DOWN)
+    remainder = int((amount - share * parts) / cent)
+    return [share + cent if i < remainder else share for i in range(parts)]
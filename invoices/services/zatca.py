@@ -0,0 +1,373 @@
+from base64 import b64encode
+from collections import defaultdict
+from itertools import takewhile
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from core.transactions import write_atomic
+from invoices.models import Invoice, InvoiceHistory
+from .constants import (
+    INVOICE_STATUS,
+    PASSED_INVOICE_STATUS,
+    SUBMITTABLE_INVOICE_STATUS,
+)
+from .chain import hold_account_chain
+from .qrcode import generate_qrcode
+from .reconcile import fetch_zatca_records
+from .sign_client import get_sign_client
+from .signer import ZATCA_LOCAL_SIGNING, sign_invoice
+from .utils import build_invoice_history
+
+ZATCA_SUBMISSION_CONCURRENCY = settings.ZATCA_SUBMISSION_CONCURRENCY
+ZATCA_SUBMISSION_BATCH_SIZE = settings.ZATCA_SUBMISSION_BATCH_SIZE
+ZATCA_SUBMISSION_MAX_ATTEMPTS = settings.ZATCA_SUBMISSION_MAX_ATTEMPTS
+ZATCA_SUBMISSION_LOCK_TIMEOUT = settings.ZATCA_SUBMISSION_LOCK_TIMEOUT
+ZATCA_REPORTING_BATCH_SIZE = settings.ZATCA_REPORTING_BATCH_SIZE
+
+SUBMISSION_FIELDS = [
+    "status",
+    "note",
+    "invoice_pk",
+    "invoice_number",
+    "previous_hash",
+    "invoice_hash",
+    "qrcode",
+    "shared_at",
+]
+
+
+def pending_submissions(invoice_type):
+    """
+    Return the ids of the invoices waiting to be shared with ZATCA grouped by account,
+    invoices rejected ZATCA_SUBMISSION_MAX_ATTEMPTS times are left for the staff
+     - standard invoices are cleared one by one
+     - simplified invoices are reported in batches
+    """
+    invoices = (
+        Invoice.objects.filter(
+            document_type="invoice",
+            invoice_type=invoice_type,
+            status__in=SUBMITTABLE_INVOICE_STATUS,
+        )
+        .annotate(
+            attempts=Count("history", filter=Q(history__action_type="reject_invoice"))
+        )
+        .filter(attempts__lt=ZATCA_SUBMISSION_MAX_ATTEMPTS)
+        .order_by("created_at")
+        .values_list("account_id", "id")
+    )
+
+    pending = defaultdict(list)
+    for account_id, invoice_id in invoices.iterator():
+        pending[account_id].append(invoice_id)
+    return pending
+
+
+def submission_lock_key(account_id, invoice_type):
+    return f"zatca:submitting:{invoice_type}:{account_id}"
+
+
+def acquire_submission_lock(account_id, workers, invoice_type="standard"):
+    """
+    Lock the account for `workers` submission tasks,
+    False if the account invoices are still being submitted
+    """
+    return cache.add(
+        submission_lock_key(account_id, invoice_type),
+        workers,
+        ZATCA_SUBMISSION_LOCK_TIMEOUT,
+    )
+
+
+def release_submission_lock(account_id, invoice_type="standard"):
+    """
+    Release one worker of the account, the lock is removed with the last one
+    """
+    key = submission_lock_key(account_id, invoice_type)
+    try:
+        if cache.decr(key) <= 0:
+            cache.delete(key)
+    except ValueError:
+        # the lock has expired
+        pass
+
+
+def split_submissions(invoice_ids):
+    """
+    Split the account invoices between at most ZATCA_SUBMISSION_CONCURRENCY workers
+    """
+    invoice_ids = invoice_ids[:ZATCA_SUBMISSION_BATCH_SIZE]
+    workers = min(ZATCA_SUBMISSION_CONCURRENCY, len(invoice_ids))
+    return [invoice_ids[i::workers] for i in range(workers)]
+
+
+def build_submission_payload(invoice: Invoice, previous_hash=None):
+    """
+    Build the signing service payload of the invoice, the idempotency key
+    (uid and ICV) is the same when a submission is sent again
+    """
+    account = invoice.account
+    customer = invoice.customer_info
+    return {
+        "id": invoice.pk,
+        "idempotency_key": f"{invoice.uid}:{invoice.invoice_number}",
+        "uid": invoice.uid,
+        "invoice_type": invoice.invoice_type,
+        "invoice_code": invoice.invoice_code,
+        "invoice_number": invoice.invoice_number,
+        "previous_hash": previous_hash,
+        "reference_pk": invoice.reference_pk,
+        "payment_method": invoice.payment_method,
+        "created_at": invoice.created_at.isoformat(),
+        "delivery_date": invoice.delivery_date.isoformat(),
+        "sub_total": str(invoice.sub_total),
+        "discount_amount": str(invoice.discount_amount),
+        "total_after_discount": str(invoice.total_after_discount),
+        "vat_amount": str(invoice.vat_amount),
+        "total_after_vat": str(invoice.total_after_vat),
+        "seller": {
+            "organization": account.organization,
+            "register_number": account.register_number,
+            "tax_number": account.tax_number,
+            "country": account.country,
+            "city": account.city,
+            "street": account.street,
+        },
+        "customer": (
+            {
+                "organization": customer.organization,
+                "tax_number": customer.tax_number,
+                "city": customer.city,
+                "street": customer.street,
+                "building_number": customer.building_number,
+                "postal_zone": customer.postal_zone,
+                "district_name": customer.district_name,
+            }
+            if customer
+            else None
+        ),
+        "items": [
+            {
+                "name": item.name,
+                "price": str(item.price),
+                "quantity": item.quantity,
+                "vat": str(item.vat),
+                "discount": str(item.discount),
+                "sub_total": str(item.sub_total),
+                "vat_amount": str(item.vat_amount),
+                "total": str(item.total),
+            }
+            for item in invoice.items.all()
+        ],
+    }
+
+
+def add_local_signature(payload, invoice: Invoice, previous_hash):
+    """
+    Sign the invoice in process (ZATCA_LOCAL_SIGNING) chained from previous_hash,
+    the signing service then only forwards the signed XML to ZATCA
+    """
+    invoice.previous_hash = previous_hash
+    signed_xml = sign_invoice(invoice)
+    payload.update(
+        {
+            "invoice_hash": invoice.invoice_hash,
+            "qrcode": invoice.qrcode,
+            "signed_xml": b64encode(signed_xml).decode("utf-8"),
+        }
+    )
+    return payload
+
+
+def post_invoice(payload):
+    """
+    Send the invoice to the signing service and return its result
+    """
+    response = get_sign_client().post("invoices/", json=payload)
+    if response.status_code >= 400:
+        # the invoice itself is invalid, keep the service message as the error note
+        return {"status": "error", "note": response.text}
+
+    return response.json()
+
+
+def post_report_batch(payloads, previous_hash):
+    """
+    Report a batch of simplified invoices chained from previous_hash in the
+    payloads order, return the results by invoice id
+    """
+    response = get_sign_client().post(
+        "invoices/report/",
+        json={"previous_hash": previous_hash, "invoices": payloads},
+    )
+    if response.status_code >= 400:
+        return {
+            payload["id"]: {"status": "error", "note": response.text}
+            for payload in payloads
+        }
+
+    return {result["id"]: result for result in response.json()["results"]}
+
+
+def previous_results(invoices):
+    """
+    Results of the invoices sent by a previous attempt whose response was lost
+    (ZatcaResultUnknownError), taken from the signing service records when
+    the attempt reached ZATCA. {} when none of them was accepted, they're then
+    sent again.
+    """
+    records = fetch_zatca_records([invoice.pk for invoice in invoices])
+    if not any(
+        record.get("status") in PASSED_INVOICE_STATUS for record in records.values()
+    ):
+        return {}
+    return records
+
+
+def shareable_credit_invoices(invoices):
+    """
+    Check with one query which credit invoices can be shared, {invoice id: bool}
+    """
+    credit_ids = [
+        invoice.pk for invoice in invoices if invoice.invoice_code == "credit"
+    ]
+    if not credit_ids:
+        return {}
+    return InvoiceHistory.can_share_credit_invoices(credit_ids)
+
+
+def credit_share_error(invoice: Invoice, shareable):
+    """
+    Return the error result of a credit invoice that can't be shared, None otherwise
+    """
+    if invoice.invoice_code == "credit" and not shareable.get(invoice.pk):
+        return {
+            "status": "error",
+            "note": "The original invoice was not shared with the current ZATCA configuration",
+        }
+    return None
+
+
+def set_submission_result(invoice: Invoice, result):
+    """
+    Set the ZATCA result on the invoice (without saving it)
+    and return the unsaved history record of the status transition
+    """
+    status = result.get("status")
+    if status not in dict(INVOICE_STATUS) or status == "standby":
+        status = "error"
+
+    invoice.status = status
+    invoice.note = result.get("note")
+    invoice.invoice_pk = result.get("invoice_pk") or invoice.invoice_pk
+    # the locally signed invoices already have their hash and qrcode
+    invoice.invoice_hash = result.get("invoice_hash") or invoice.invoice_hash
+    invoice.qrcode = result.get("qrcode") or invoice.qrcode
+    if status in PASSED_INVOICE_STATUS:
+        invoice.shared_at = timezone.now()
+    elif ZATCA_LOCAL_SIGNING:
+        # the rejected invoice is signed again when it's submitted again
+        invoice.qrcode = generate_qrcode(invoice)
+
+    return build_invoice_history(
+        invoice,
+        action_type=(
+            "share_invoice" if status in PASSED_INVOICE_STATUS else "reject_invoice"
+        ),
+    )
+
+
+def submit_invoice(invoice: Invoice, shareable=None, confirm=False):
+    """
+    Share the invoice with ZATCA through the signing service,
+    shareable is the shareable_credit_invoices() result of the submitted batch.
+    confirm checks the signing service records first, when the previous
+    attempt raised ZatcaResultUnknownError.
+    Raise ZatcaServiceError when the service can't be reached.
+    """
+    if shareable is None:
+        shareable = shareable_credit_invoices([invoice])
+
+    if error := credit_share_error(invoice, shareable):
+        history = set_submission_result(invoice, error)
+        with transaction.atomic():
+            invoice.save(update_fields=SUBMISSION_FIELDS)
+            history.save()
+        return
+
+    # the account chain is held (not locked in the database) until the result is saved
+    with hold_account_chain(invoice.account_id) as chain:
+        chain.assign(invoice)
+        result = previous_results([invoice]).get(invoice.pk) if confirm else None
+        if result is None:
+            payload = build_submission_payload(invoice, chain.previous_hash)
+            if ZATCA_LOCAL_SIGNING:
+                add_local_signature(payload, invoice, chain.previous_hash)
+            result = post_invoice(payload)
+        history = set_submission_result(invoice, result)
+
+        with write_atomic():
+            chain.advance([invoice])
+            chain.save()
+            invoice.save(update_fields=SUBMISSION_FIELDS)
+            history.save()
+
+
+def report_invoices(invoices, confirm=False):
+    """
+    Report the account simplified invoices in batches of ZATCA_REPORTING_BATCH_SIZE,
+    each batch is chained while holding the account chain and saved in a short
+    transaction with one bulk_update and one bulk_create.
+    confirm checks the signing service records of the first batch first, when
+    the previous attempt raised ZatcaResultUnknownError.
+    Raise ZatcaServiceError when the service can't be reached.
+    """
+    shareable = shareable_credit_invoices(invoices)
+
+    for start in range(0, len(invoices), ZATCA_REPORTING_BATCH_SIZE):
+        batch = invoices[start : start + ZATCA_REPORTING_BATCH_SIZE]
+
+        with hold_account_chain(batch[0].account_id) as chain:
+            results = {}
+            chained = []
+            for invoice in batch:
+                if error := credit_share_error(invoice, shareable):
+                    results[invoice.pk] = error
+                else:
+                    chain.assign(invoice)
+                    chained.append(invoice)
+            previous = (
+                previous_results(chained) if chained and confirm and start == 0 else {}
+            )
+            if previous:
+                # the previous attempt reported the batch, its results are kept
+                results.update(previous)
+            elif chained:
+                payloads = [build_submission_payload(invoice) for invoice in chained]
+                if ZATCA_LOCAL_SIGNING:
+                    previous_hash = chain.previous_hash
+                    for invoice, payload in zip(chained, payloads):
+                        add_local_signature(payload, invoice, previous_hash)
+                        previous_hash = invoice.invoice_hash
+                results.update(post_report_batch(payloads, chain.previous_hash))
+
+            # invoices missing from the results are reported again in the next run
+            reported = [invoice for invoice in batch if invoice.pk in results]
+            histories = [
+                set_submission_result(invoice, results[invoice.pk])
+                for invoice in reported
+            ]
+
+            # the chain stops at the first invoice missing from the results,
+            # the invoices after it were chained on a hash that is unknown
+            answered = list(takewhile(lambda invoice: invoice.pk in results, chained))
+            with write_atomic():
+                chain.advance(answered)
+                for invoice in chained[len(answered) :]:
+                    chain.drop(invoice)
+                chain.save()
+
+                Invoice.objects.bulk_update(reported, SUBMISSION_FIELDS)
+                InvoiceHistory.objects.bulk_create(histories)
@@ -0,0 +1,168 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+import datetime
+import io
+import random
+from invoices.models import Invoice
+from invoices.services.constants import SUBMITTABLE_INVOICE_STATUS
+from invoices.services.reconcile import InvoiceReconciler, day_range
+from invoices.services.sign_client import ZatcaResultUnknownError, ZatcaServiceError
+from invoices.services.zatca import (
+    acquire_submission_lock,
+    pending_submissions,
+    release_submission_lock,
+    report_invoices,
+    shareable_credit_invoices,
+    split_submissions,
+    submit_invoice,
+)
+
+ZATCA_SUBMISSION_MAX_RETRIES = settings.ZATCA_SUBMISSION_MAX_RETRIES
+ZATCA_REPORTING_BATCH_SIZE = settings.ZATCA_REPORTING_BATCH_SIZE
+
+
+def retry_countdown(retries):
+    """
+    Exponential backoff with jitter, capped to 10 minutes
+    """
+    return min(2**retries * 30, 600) + random.randint(0, 30)
+
+
+def submission_queryset(account_id, invoice_ids):
+    return (
+        Invoice.objects.filter(
+            pk__in=invoice_ids,
+            account_id=account_id,
+            status__in=SUBMITTABLE_INVOICE_STATUS,
+        )
+        .select_related("account__signing_credential", "customer_info")
+        .prefetch_related("items")
+        .order_by("created_at")
+    )
+
+
+@shared_task(name="dispatch_zatca_submissions")
+def dispatch_zatca_submissions():
+    """
+    Queue the standard invoices waiting to be cleared by ZATCA,
+    each account is submitted by at most ZATCA_SUBMISSION_CONCURRENCY workers
+    """
+    for account_id, invoice_ids in pending_submissions("standard").items():
+        chunks = split_submissions(invoice_ids)
+        if not acquire_submission_lock(account_id, len(chunks)):
+            # the previous run of the account is not finished yet
+            continue
+
+        for chunk in chunks:
+            submit_invoices_task.delay(account_id, chunk)
+
+
+@shared_task(
+    name="submit_invoices_task",
+    bind=True,
+    max_retries=ZATCA_SUBMISSION_MAX_RETRIES,
+)
+def submit_invoices_task(self, account_id, invoice_ids, unconfirmed=None):
+    """
+    Share the account invoices with ZATCA one by one,
+    retry the remaining invoices with exponential backoff when the signing service is down.
+    unconfirmed is the invoice whose result was lost by the previous attempt,
+    the signing service records are checked before sending it again.
+    """
+    # the account lock is released whatever happens, except when the task is retried
+    retrying = False
+    try:
+        invoices = list(submission_queryset(account_id, invoice_ids))
+        remaining = [invoice.pk for invoice in invoices]
+        shareable = shareable_credit_invoices(invoices)
+
+        for invoice in invoices:
+            submit_invoice(invoice, shareable, confirm=invoice.pk == unconfirmed)
+            remaining.remove(invoice.pk)
+    except ZatcaServiceError as e:
+        if self.request.retries < self.max_retries:
+            retrying = True
+            raise self.retry(
+                args=(account_id, remaining),
+                kwargs={
+                    "unconfirmed": remaining[0]
+                    if isinstance(e, ZatcaResultUnknownError)
+                    else None
+                },
+                exc=e,
+                countdown=retry_countdown(self.request.retries),
+            )
+        raise
+    finally:
+        if not retrying:
+            release_submission_lock(account_id)
+
+
+@shared_task(name="dispatch_zatca_reporting")
+def dispatch_zatca_reporting():
+    """
+    Queue the simplified invoices waiting to be reported to ZATCA, one task per account
+    """
+    for account_id, invoice_ids in pending_submissions("simplified").items():
+        if acquire_submission_lock(account_id, 1, invoice_type="simplified"):
+            report_invoices_task.delay(account_id, invoice_ids)
+
+
+@shared_task(
+    name="report_invoices_task",
+    bind=True,
+    max_retries=ZATCA_SUBMISSION_MAX_RETRIES,
+)
+def report_invoices_task(self, account_id, invoice_ids, unconfirmed=False):
+    """
+    Report the account simplified invoices to ZATCA in batches,
+    retry the remaining invoices with exponential backoff when the signing service is down.
+    unconfirmed when the result of the first batch was lost by the previous
+    attempt, the signing service records are checked before sending it again.
+    """
+    retrying = False
+    try:
+        for start in range(0, len(invoice_ids), ZATCA_REPORTING_BATCH_SIZE):
+            chunk = invoice_ids[start : start + ZATCA_REPORTING_BATCH_SIZE]
+            report_invoices(
+                list(submission_queryset(account_id, chunk)),
+                confirm=unconfirmed and start == 0,
+            )
+    except ZatcaServiceError as e:
+        if self.request.retries < self.max_retries:
+            retrying = True
+            raise self.retry(
+                args=(account_id, invoice_ids[start:]),
+                kwargs={"unconfirmed": isinstance(e, ZatcaResultUnknownError)},
+                exc=e,
+                countdown=retry_countdown(self.request.retries),
+            )
+        raise
+    finally:
+        if not retrying:
+            release_submission_lock(account_id, invoice_type="simplified")
+
+
+@shared_task(name="reconcile_zatca_task")
+def reconcile_zatca_task(first_day=None, last_day=None):
+    """
+    Reconcile the invoices of the [first_day, last_day] ISO dates (default: yesterday)
+    with the signing service records and store the discrepancy report
+    """
+    first_day = (
+        datetime.date.fromisoformat(first_day)
+        if first_day
+        else timezone.now().date() - datetime.timedelta(days=1)
+    )
+    last_day = datetime.date.fromisoformat(last_day) if last_day else first_day
+
+    report = io.StringIO()
+    summary = InvoiceReconciler(report=report).run(*day_range(first_day, last_day))
+    summary["report"] = default_storage.save(
+        f"reports/zatca/reconcile-{first_day}-{last_day}.csv",
+        ContentFile(report.getvalue().encode("utf-8")),
+    )
+    return summary
@@ -1,3 +1,219 @@
-from django.test import TestCase
+from base64 import b64decode
+import datetime
+from decimal import Decimal
+from unittest import mock
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from accounts.models import Account
+from invoices.models import (
+    Invoice,
+    InvoiceChain,
+    InvoiceItem,
+    Product,
+    SigningCredential,
+)
+from invoices.services import chain, zatca
+from invoices.services.constants import INITIAL_INVOICE_HASH
+from invoices.services.utils import split_amount
+from invoices.tasks import submission_queryset
 
-# Create your tests here.
+User = get_user_model()
+
+
+def create_account(email="merchant@example.com"):
+    user = User.objects.create(email=email, email_verified=True)
+    # the account is created by the post_save signal of the user
+    Account.objects.filter(user=user).update(
+        organization="Merchant", tax_number="300000000000003", taxable=True
+    )
+    return Account.objects.get(user=user)
+
+
+def create_invoices(account, count):
+    product = Product.objects.create(
+        account=account, name="Product", price=Decimal("10.00")
+    )
+    invoices = []
+    for _ in range(count):
+        invoice = Invoice.objects.create(account=account, payment_method="10")
+        InvoiceItem.objects.create(invoice=invoice, product=product, quantity=2)
+        invoice.compute_invoice_data()
+        invoices.append(invoice)
+    return invoices
+
+
+def create_signing_credential(account):
+    key = ec.generate_private_key(ec.SECP256K1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, account.organization)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return SigningCredential.objects.create(
+        account=account,
+        private_key=key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode("utf-8"),
+        certificate=certificate.public_bytes(serialization.Encoding.PEM).decode(
+            "utf-8"
+        ),
+    )
+
+
+class FakeReportService:
+    """
+    post_report_batch answering the invoices of a batch with the given statuses,
+    the sent payloads are kept
+    """
+
+    def __init__(self, *statuses):
+        self.statuses = statuses
+        self.batches = []
+
+    def __call__(self, payloads, previous_hash):
+        self.batches.append((payloads, previous_hash))
+        return {
+            payload["id"]: {
+                "status": status,
+                "invoice_hash": payload.get("invoice_hash")
+                or f"hash-{payload['invoice_number']}",
+            }
+            for payload, status in zip(payloads, self.statuses)
+        }
+
+
+class ReportChainTests(TestCase):
+    def setUp(self):
+        self.account = create_account()
+        self.invoices = create_invoices(self.account, 3)
+
+    def report(self, service):
+        ids = [invoice.pk for invoice in self.invoices]
+        with mock.patch.object(zatca, "post_report_batch", service):
+            zatca.report_invoices(list(submission_queryset(self.account.pk, ids)))
+        return list(Invoice.objects.filter(pk__in=ids).order_by("created_at", "pk"))
+
+    def test_rejected_invoice_stays_in_the_sent_chain(self):
+        first, second, third = self.report(
+            FakeReportService("rejected", "passed", "passed")
+        )
+
+        # the invoices after the rejected one were chained on its hash
+        self.assertEqual(first.status, "rejected")
+        self.assertEqual(
+            (first.invoice_number, first.previous_hash), (1, INITIAL_INVOICE_HASH)
+        )
+        self.assertEqual((second.invoice_number, second.previous_hash), (2, "hash-1"))
+        self.assertEqual((third.invoice_number, third.previous_hash), (3, "hash-2"))
+        chain = InvoiceChain.objects.get(account=self.account)
+        self.assertEqual((chain.last_counter, chain.last_hash), (3, "hash-3"))
+
+    def test_trailing_rejected_invoices_leave_the_chain(self):
+        first, second, third = self.report(
+            FakeReportService("passed", "rejected", "error")
+        )
+
+        self.assertEqual((first.invoice_number, first.invoice_hash), (1, "hash-1"))
+        self.assertEqual([second.invoice_number, third.invoice_number], [None, None])
+        chain = InvoiceChain.objects.get(account=self.account)
+        self.assertEqual((chain.last_counter, chain.last_hash), (1, "hash-1"))
+
+    def test_stored_chain_matches_the_signed_invoices(self):
+        create_signing_credential(self.account)
+        service = FakeReportService("rejected", "passed", "passed")
+        with mock.patch.object(zatca, "ZATCA_LOCAL_SIGNING", True):
+            invoices = self.report(service)
+
+        (payloads, previous_hash), = service.batches
+        self.assertEqual(previous_hash, INITIAL_INVOICE_HASH)
+        for invoice, payload in zip(invoices, payloads):
+            signed_xml = b64decode(payload["signed_xml"]).decode("utf-8")
+            self.assertEqual(invoice.invoice_number, payload["invoice_number"])
+            self.assertEqual(invoice.invoice_hash, payload["invoice_hash"])
+            self.assertIn(f">{invoice.previous_hash}<", signed_xml)
+        chain = InvoiceChain.objects.get(account=self.account)
+        self.assertEqual(chain.last_hash, invoices[-1].invoice_hash)
+
+
+class ChainConcurrencyTests(TestCase):
+    def setUp(self):
+        self.account = create_account()
+        self.first, self.second = create_invoices(self.account, 2)
+        self.addCleanup(cache.clear)
+
+    def submission(self, invoice):
+        return list(submission_queryset(self.account.pk, [invoice.pk]))[0]
+
+    def test_worker_saving_on_a_moved_head_conflicts(self):
+        # the chain lock expired while the first worker waited for the service,
+        # the second worker took it and saved its invoice first
+        def post_invoice(payload):
+            cache.delete(f"zatca:chain:{self.account.pk}")
+            if payload["id"] == self.first.pk:
+                zatca.submit_invoice(self.submission(self.second))
+            return {"status": "passed", "invoice_hash": f"hash-{payload['id']}"}
+
+        with mock.patch.object(zatca, "post_invoice", post_invoice):
+            with self.assertRaises(chain.ChainConflictError):
+                zatca.submit_invoice(self.submission(self.first))
+
+        first = Invoice.objects.get(pk=self.first.pk)
+        second = Invoice.objects.get(pk=self.second.pk)
+        self.assertEqual((first.status, first.invoice_number), ("standby", None))
+        self.assertEqual(
+            (second.invoice_number, second.previous_hash), (1, INITIAL_INVOICE_HASH)
+        )
+        head = InvoiceChain.objects.get(account=self.account)
+        self.assertEqual((head.last_counter, head.last_hash), (1, second.invoice_hash))
+
+    def test_expired_lock_of_another_worker_is_kept(self):
+        key = f"zatca:chain:{self.account.pk}"
+        with chain.hold_account_chain(self.account.pk):
+            # expired and taken by another worker
+            cache.set(key, 1, 60)
+        self.assertEqual(cache.get(key), 1)
+
+    def test_held_chain_is_busy(self):
+        with chain.hold_account_chain(self.account.pk):
+            with mock.patch.object(chain, "ZATCA_CHAIN_LOCK_TIMEOUT", 0):
+                with self.assertRaises(chain.ChainBusyError):
+                    with chain.hold_account_chain(self.account.pk):
+                        pass
+        with chain.hold_account_chain(self.account.pk):
+            pass
+
+
+class SplitAmountTests(SimpleTestCase):
+    def test_remaining_cents_go_to_the_first_shares(self):
+        self.assertEqual(
+            split_amount("10.00", 3),
+            [Decimal("3.34"), Decimal("3.33"), Decimal("3.33")],
+        )
+        self.assertEqual(
+            split_amount(Decimal("0.05"), 3),
+            [Decimal("0.02"), Decimal("0.02"), Decimal("0.01")],
+        )
+
+    def test_shares_add_up_to_the_amount(self):
+        for amount in ("0.01", "1", "10.00", "99.99", "1234.567"):
+            for parts in (1, 2, 3, 7, 13):
+                shares = split_amount(amount, parts)
+                self.assertEqual(len(shares), parts)
+                self.assertEqual(
+                    sum(shares), Decimal(amount).quantize(Decimal("0.01"))
+                )
+                self.assertLessEqual(max(shares) - min(shares), Decimal("0.01"))
@@ -13,14 +13,22 @@ from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .services.filters import InvoiceFilter
+from .services.throttling import (
+    InvoiceCreateThrottle,
+    InvoiceStatusThrottle,
+    InvoicePdfThrottle,
+)
 from datetime import timedelta
 from django.shortcuts import render
 from .services.qrcode import create_qrcode_image
+from accounts.services.images import logo_data_uri
 from django.views import View
 import jwt
+import math
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.http import (
+    HttpResponse,
     HttpResponseBadRequest,
     HttpResponseNotFound,
     HttpResponseForbidden,
@@ -60,6 +68,7 @@ class AccountRelatedMixin:
 class CustomerListView(AccountRelatedMixin, generics.ListCreateAPIView):
     serializer_class = CustomerSerializer
     model = Customer
+    use_read_replica = True  # GET requests read from the replicas
 
 
 class CustomerDetailView(AccountRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
@@ -70,6 +79,7 @@ class CustomerDetailView(AccountRelatedMixin, generics.RetrieveUpdateDestroyAPIV
 class ProductListView(AccountRelatedMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
     model = Product
+    use_read_replica = True
 
 
 class ProductDetailView(AccountRelatedMixin, generics.RetrieveUpdateDestroyAPIView):
@@ -82,6 +92,12 @@ class InvoiceListView(AccountRelatedMixin, generics.ListCreateAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_class = InvoiceFilter
     model = Invoice
+    use_read_replica = True
+
+    def get_throttles(self):
+        if self.request.method == "POST":
+            return [InvoiceCreateThrottle()]
+        return super().get_throttles()
 
 
 class EditInvoiceCodeView(AccountRelatedMixin, generics.UpdateAPIView):
@@ -105,6 +121,9 @@ class InvoiceStatusView(APIView):
     Get invoice status statistics in a day and a month
     """
 
+    throttle_classes = [InvoiceStatusThrottle]
+    use_read_replica = True
+
     def get(self, request):
         account = request.user.account
         today = timezone.now().date()
@@ -149,6 +168,8 @@ class InvoicePdfView(View):
     Get invoice pdf file by invoice id and access token
     """
 
+    use_read_replica = True
+
     def is_admin_user(self, user):
         return (user.is_superuser or user.is_staff) and user.is_authenticated
 
@@ -170,21 +191,34 @@ class InvoicePdfView(View):
             except jwt.DecodeError:
                 return HttpResponseBadRequest("Invalid access token")
 
+            throttle = InvoicePdfThrottle()
+            if not throttle.allow(user_id):
+                response = HttpResponse("Too many requests", status=429)
+                response["Retry-After"] = str(math.ceil(throttle.wait()))
+                return response
+
         try:
             user = User.objects.get(id=user_id) if not is_admin else None
-            invoice = Invoice.objects.get(id=pk)
+            invoice = Invoice.objects.select_related("account").get(id=pk)
 
             # check invoice status
             # if invoice.status not in ["passed", "passed_with_warnings"]:
             #     return HttpResponseBadRequest("Invalid pdf for non-passed invoice to ZATCA")
 
             # Check if the user is authorized to access this invoice
-            if is_admin or user == invoice.account.user:
+            if is_admin or user.pk == invoice.account.user_id:
                 qrcode = create_qrcode_image(invoice.qrcode)
+                account = invoice.account
                 return render(
                     request,
                     "invoices/pdf_mold.html",
-                    {"invoice": invoice, "qrcode": qrcode},
+                    {
+                        "invoice": invoice,
+                        "qrcode": qrcode,
+                        # use the generated variants, fallback to the original logo
+                        "logo": account.logo_header or account.logo,
+                        "logo_inline": logo_data_uri(account.logo_inline),
+                    },
                 )
             else:
                 return HttpResponseForbidden()
@@ -0,0 +1,20 @@
+"""
+Celery config for project project.
+
+Run the worker and the scheduler with:
+    celery -A project worker -l info
+    celery -A project beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+
+app = Celery("project")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+
+# tasks live in <app>/tasks.py, the email tasks in authentication/emails.py
+app.autodiscover_tasks()
+app.autodiscover_tasks(related_name="emails")
@@ -1,7 +1,9 @@
 from pathlib import Path
-from decouple import config as env
+from decouple import Csv, config as env
 import datetime
+import dj_database_url
 import os
+import sys
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,16 +36,19 @@ INSTALLED_APPS = [
     "authentication",
     "accounts",
     "invoices",
+    "analytics",
 ]
 
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -75,13 +80,70 @@ TEMPLATES = [
 WSGI_APPLICATION = "project.wsgi.application"
 
 
-# Database Configuration
+# Database Configuration, DATABASE_URL is the primary database and
+# DATABASE_REPLICA_URLS the comma separated read replicas (see core.routers)
+DATABASE_CONN_MAX_AGE = env("DATABASE_CONN_MAX_AGE", default=60, cast=int)
 DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
-        }
+    "default": dj_database_url.parse(
+        env("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+}
+for index, url in enumerate(env("DATABASE_REPLICA_URLS", default="", cast=Csv())):
+    DATABASES[f"replica{index}"] = {
+        **dj_database_url.parse(
+            url, conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True
+        ),
+        # the tests read the replicas from the test primary database
+        "TEST": {"MIRROR": "default"},
     }
+# PRAGMAs of every SQLite connection (core.signals): WAL lets the readers run
+# during a write and the busy timeout makes the concurrent writers wait for
+# the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": env("SQLITE_JOURNAL_MODE", default="wal"),
+    "synchronous": env("SQLITE_SYNCHRONOUS", default="normal"),
+    "mmap_size": env("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+    "cache_size": env("SQLITE_CACHE_SIZE", default=-64000, cast=int),  # KiB when negative
+    "busy_timeout": env("SQLITE_BUSY_TIMEOUT", default=30000, cast=int),  # ms
+}
+# BEGIN mode of the transactions (core.backends.sqlite3). IMMEDIATE would make
+# every transaction a database write lock, the transactions reading before
+# writing take it with core.transactions.write_atomic instead
+SQLITE_TRANSACTION_MODE = env("SQLITE_TRANSACTION_MODE", default="DEFERRED")
+for database in DATABASES.values():
+    if database["ENGINE"] == "django.db.backends.sqlite3":
+        database["ENGINE"] = "core.backends.sqlite3"
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+# seconds a user reads from the primary database after a write (read your writes)
+DATABASE_STICKY_SECONDS = env("DATABASE_STICKY_SECONDS", default=5, cast=int)
+
+
+# Cache Configuration, the shared Redis cache (L2) holds the cross-worker state
+# (throttle buckets, cached profiles). Local memory is used when it's not set
+# and in the tests. The "local" cache is the per-process L1 of core.cache
+REDIS_URL = env("REDIS_URL", default=None)
+# manage.py test or pytest (pytest-django imports the settings after pytest)
+TESTING = sys.argv[1:2] == ["test"] or "pytest" in sys.modules
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL and not TESTING
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "local",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+CACHE_LOCAL_TIMEOUT = 10  # seconds the processes keep their L1 copies
+CACHE_TTL_JITTER = 0.1  # shared timeouts spread by +/- 10%
+CACHE_LOCK_TIMEOUT = 10  # seconds a process computes a missing value alone
 
 
 # Password validation
@@ -117,6 +179,8 @@ STATICFILES_DIRS = [
 # media files configuration
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# private files, never served (the provisioning uploads hold plaintext passwords)
+PRIVATE_ROOT = env("PRIVATE_ROOT", default=os.path.join(BASE_DIR, "private"))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -125,10 +189,86 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 SITE_URL = env("SITE_URL")
 
 # Singing Service URL
-SIGN_INV_SVC_URL = "sign service url"
+SIGN_INV_SVC_URL = env("SIGN_INV_SVC_URL", default="sign service url")
+SIGN_INV_SVC_CONNECT_TIMEOUT = env("SIGN_INV_SVC_CONNECT_TIMEOUT", default=3.05, cast=float)
+SIGN_INV_SVC_READ_TIMEOUT = env("SIGN_INV_SVC_READ_TIMEOUT", default=20, cast=float)
+SIGN_INV_SVC_POOL_SIZE = 10  # keep-alive connections per process
+SIGN_INV_SVC_RETRIES = 2  # retries of the idempotent calls
+SIGN_INV_SVC_BREAKER_THRESHOLD = 5  # consecutive failures before failing fast
+SIGN_INV_SVC_BREAKER_RESET = 30  # seconds before trying the service again
+
+# ZATCA submission pipeline
+ZATCA_SUBMISSION_CONCURRENCY = 2  # parallel submissions per account
+ZATCA_SUBMISSION_BATCH_SIZE = 50  # invoices queued per account and run
+ZATCA_SUBMISSION_MAX_ATTEMPTS = 5  # rejected/error submissions before giving up
+ZATCA_SUBMISSION_MAX_RETRIES = 5  # retries when the signing service is unreachable
+ZATCA_SUBMISSION_LOCK_TIMEOUT = 60 * 60
+# seconds a submission may hold the account invoice chain, over the signing service timeouts
+ZATCA_CHAIN_LOCK_TIMEOUT = 2 * 60
+ZATCA_REPORTING_BATCH_SIZE = 100  # simplified invoices reported per request
+ZATCA_RECONCILE_CHUNK_SIZE = 500  # invoices compared per signing service lookup
+# Sign the invoices in process with the account keys (invoices.SigningCredential),
+# the signing service is then only used to forward them to ZATCA
+ZATCA_LOCAL_SIGNING = env("ZATCA_LOCAL_SIGNING", default=False, cast=bool)
+
+
+# Prometheus /metrics Bearer token, the metrics are only public in DEBUG when it's not set
+METRICS_TOKEN = env("METRICS_TOKEN", default=None)
+
+# Requests logged with their SQL profile (core.middleware) when over one of the budgets
+SQL_PROFILE_TIME_BUDGET = env("SQL_PROFILE_TIME_BUDGET", default=1.0, cast=float)  # seconds
+SQL_PROFILE_QUERY_BUDGET = env("SQL_PROFILE_QUERY_BUDGET", default=50, cast=int)
+SQL_PROFILE_TOP_QUERIES = 5  # statements in the report
+
+
+# Admin dashboard rollups, the months rebuilt by every refresh
+ANALYTICS_REFRESH_MONTHS = 2
+
+
+# Celery Configuration
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default=REDIS_URL)
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULE = {
+    "dispatch-zatca-submissions": {
+        "task": "dispatch_zatca_submissions",
+        "schedule": 60,
+    },
+    # simplified invoices only need to be reported within 24 hours
+    "dispatch-zatca-reporting": {
+        "task": "dispatch_zatca_reporting",
+        "schedule": 15 * 60,
+    },
+    "reconcile-zatca": {
+        "task": "reconcile_zatca_task",
+        "schedule": 24 * 60 * 60,
+    },
+    "refresh-analytics": {
+        "task": "refresh_analytics",
+        "schedule": 60 * 60,
+    },
+    "purge-provisioning-uploads": {
+        "task": "purge_provisioning_uploads",
+        "schedule": 60 * 60,
+    },
+}
 
 
 # Config subscription settings
 FREE_PERIOD = 10
 DAYS_BEFORE_RENEWAL = 5
 
+# Account profile cache timeout in seconds, it also bounds how long a
+# subscription expiration takes to show in the cached profile
+ACCOUNT_PROFILE_CACHE_TIMEOUT = 300
+PACKAGES_CACHE_TIMEOUT = 60 * 60
+
+
+
+# Per-account token bucket rates of the expensive endpoints ("<tokens>/<s|min|hour|day>")
+ACCOUNT_THROTTLE_RATES = {
+    "invoice_create": env("THROTTLE_INVOICE_CREATE", default="60/min"),
+    "invoice_status": env("THROTTLE_INVOICE_STATUS", default="30/min"),
+    "invoice_pdf": env("THROTTLE_INVOICE_PDF", default="60/min"),
+}